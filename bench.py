@@ -0,0 +1,216 @@
+'''
+Benchmarks of qq.py.
+
+   python bench.py startup [--repeat N] [--max SECONDS] [--json FILE]
+   python bench.py generate FILE [--rows N] [--quantitative N] [--integer N] [--categorical N] [--levels N]
+   python bench.py pipeline [FILE] [--rows N] ... [--repeat N] [--json FILE]
+'''
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+#-----------------------------------------------------------------------------
+# Wall time of a command, best of repeat runs.  Commands run from the root
+# directory, so that nothing is found relative to the working directory.
+#-----------------------------------------------------------------------------
+
+def timeit(command, repeat=5):
+   times = []
+   with open(os.devnull, 'w') as devnull:
+      for i in range(repeat):
+         start = time.time()
+         subprocess.check_call(command, cwd='/', stdout=devnull)
+         times.append(time.time() - start)
+   return min(times)
+
+#-----------------------------------------------------------------------------
+# Startup time: importing qq, and running qq.py --help, neither of which
+# should import matplotlib.
+#-----------------------------------------------------------------------------
+
+def startup(repeat=5):
+   python = sys.executable
+   qq = os.path.join(HERE, 'qq.py')
+   check = 'import sys; sys.path.insert(0, %r); import qq; assert "matplotlib" not in sys.modules' % HERE
+   return [
+      ('python', timeit([python, '-c', 'pass'], repeat)),
+      ('import qq', timeit([python, '-c', check], repeat)),
+      ('qq.py --help', timeit([python, qq, '--help'], repeat)),
+   ]
+
+#-----------------------------------------------------------------------------
+# Write a synthetic data file, comma separated if its name ends in .csv and
+# tab separated otherwise, chunksize rows at a time.  Columns are named after
+# their kind:
+#    q0, q1, ... : normally distributed floats, each correlated with q0
+#    i0, i1, ... : integers from 0 to 99
+#    c0, c1, ... : categories L0 ... L<levels-1>, the first ones more frequent
+#-----------------------------------------------------------------------------
+
+def generate(filename, nrow, quantitative=2, integer=1, categorical=2, levels=5, seed=0, chunksize=1000000):
+   sep = ',' if filename.endswith('.csv') else '\t'
+   names = [ 'q%d' % i for i in range(quantitative) ] + [ 'i%d' % i for i in range(integer) ] + \
+      [ 'c%d' % i for i in range(categorical) ]
+   random = np.random.RandomState(seed)
+   p = 1.0 / np.arange(1, levels+1)
+   p /= p.sum()
+   with open(filename, 'w') as f:
+      f.write(sep.join(names) + '\n')
+      for start in range(0, nrow, chunksize):
+         n = min(chunksize, nrow - start)
+         q0 = random.normal(size=n)
+         columns = [ np.char.mod('%.6g', q0 * (i > 0) + random.normal(size=n)) for i in range(quantitative) ] + \
+            [ np.char.mod('%d', random.randint(0, 100, n)) for i in range(integer) ] + \
+            [ np.char.mod('L%d', random.choice(levels, n, p=p)) for i in range(categorical) ]
+         lines = columns[0]
+         for c in columns[1:]:
+            lines = np.char.add(np.char.add(lines, sep), c)
+         f.write('\n'.join(lines) + '\n')
+
+#-----------------------------------------------------------------------------
+# Time every stage of qq on a file made by generate, best of repeat runs:
+# reading (splitting lines, then parsing and inferring column types), grouping
+# rows, preparing legends and drawing each kind of plot to a file with the
+# Agg backend.  Returns a list of (stage, seconds) and the number of rows;
+# plots that fail take None seconds.
+#-----------------------------------------------------------------------------
+
+def pipeline(filename, repeat=3):
+   import matplotlib
+   matplotlib.use('Agg')
+   sys.path.insert(0, HERE)
+   import qq
+   qq.load_matplotlib()
+
+   results = []
+   def measure(stage, f, setup=None):
+      times = []
+      for i in range(repeat):
+         if setup is not None:
+            setup()
+         start = time.time()
+         value = f()
+         times.append(time.time() - start)
+      results.append((stage, min(times)))
+      return value
+
+   rows = measure('read.split', lambda: list(qq.iter_rows(filename)))
+   measure('read.parse', lambda: qq.parse_lines(rows[0], rows[1:]))
+   rows = None
+   data = measure('read', lambda: qq.read(filename))
+   measure('groupby', lambda: qq.GroupBy([ qq.group_key(data[c]) for c in ('c0', 'c1') ], data.nrow).count())
+
+   def legend(**settings):
+      data.set(**settings)
+      data.styles['legend_marker'] = 'o'
+      plot = qq.QQPlot(data)
+      plot.prepare_legend()
+   measure('prepare_legend.categorical', lambda: legend(x='q0', y='q1', group='c0'))
+   measure('prepare_legend.quantitative', lambda: legend(x='q0', y='q1', group='i0'))
+
+   out = tempfile.mkdtemp()
+   plots = [
+      ('discrete', dict(x='q0', y='q1')),
+      ('discrete.group', dict(x='q0', y='q1', group='c0')),
+      ('discrete.facets', dict(x='q0', y='q1', xx='c0', yy='c1')),
+      ('sequential', dict(x='q0', y='q1')),
+      ('density', dict(x='q0', y='q1', group='c0')),
+      ('distribution', dict(x='q0')),
+      ('count', dict(x='c0')),
+      ('sum', dict(x='c0', y='q0', group='c1')),
+      ('average', dict(x='c0', y='q0', group='c1')),
+      ('quartiles', dict(x='c0', y='q0', group='c1')),
+   ]
+   try:
+      for name, settings in plots:
+         xy = name.split('.')[0]
+         def setup():
+            data.set(xy=xy, **settings)
+            data.clear_memo()
+         try:
+            measure('plot.' + name, lambda: data.plot(os.path.join(out, name + '.png')), setup)
+         except Exception as e:
+            sys.stderr.write('plot.%s failed: %s\n' % (name, e))
+            results.append(('plot.' + name, None))
+            qq.plt.close('all')
+   finally:
+      shutil.rmtree(out, ignore_errors=True)
+   return results, data.nrow
+
+#-----------------------------------------------------------------------------
+# Versions of everything timed, to tell results apart.
+#-----------------------------------------------------------------------------
+
+def environment():
+   import matplotlib
+   import multiprocessing
+   try:
+      with open(os.devnull, 'w') as devnull:
+         commit = subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=HERE, stderr=devnull).strip()
+   except (OSError, subprocess.CalledProcessError):
+      commit = None
+   return dict(commit=commit, python=platform.python_version(), numpy=np.__version__,
+      matplotlib=matplotlib.__version__, machine=platform.machine(), cpus=multiprocessing.cpu_count())
+
+#-----------------------------------------------------------------------------
+
+if __name__ == '__main__':
+   import argparse
+   parser = argparse.ArgumentParser()
+   parser.add_argument("benchmark", choices=['startup', 'generate', 'pipeline'])
+   parser.add_argument("file", nargs='?', default=None, help="data file to write with generate, or to time with pipeline; a temporary file by default.")
+   parser.add_argument("--rows", type=float, default=1e5, help="number of rows of generated files.")
+   parser.add_argument("--quantitative", type=int, default=2, help="number of float columns of generated files (at least 2 for pipeline).")
+   parser.add_argument("--integer", type=int, default=1, help="number of integer columns of generated files (at least 1 for pipeline).")
+   parser.add_argument("--categorical", type=int, default=2, help="number of categorical columns of generated files (at least 2 for pipeline).")
+   parser.add_argument("--levels", type=int, default=5, help="number of categories of each categorical column.")
+   parser.add_argument("--repeat", type=int, default=None, help="number of runs of each stage; the best is reported.")
+   parser.add_argument("--max", type=float, default=None, help="fail if any command takes longer than this many seconds (startup).")
+   parser.add_argument("--json", default=None, help="write the results to this JSON file ('-' for standard output).")
+   args = parser.parse_args()
+
+   options = dict(nrow=int(args.rows), quantitative=args.quantitative, integer=args.integer,
+      categorical=args.categorical, levels=args.levels)
+   if args.benchmark == 'generate':
+      if args.file is None:
+         parser.error("generate needs a file name.")
+      generate(args.file, **options)
+      sys.exit()
+
+   if args.benchmark == 'startup':
+      results = startup(args.repeat or 5)
+   else:
+      tmp = None
+      if args.file is None:
+         tmp = tempfile.mkdtemp()
+         args.file = os.path.join(tmp, 'bench.csv')
+         generate(args.file, **options)
+      try:
+         results, nrow = pipeline(args.file, args.repeat or 3)
+      finally:
+         if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+   if args.json is None:
+      for name, t in results:
+         print('%-28s %s' % (name, 'failed' if t is None else '%8.3f s' % t))
+   else:
+      report = dict(benchmark=args.benchmark, environment=environment(), results=[ dict(stage=name, seconds=t) for name, t in results ])
+      if args.benchmark == 'pipeline':
+         report.update(file=os.path.basename(args.file), rows=nrow)
+      if args.json == '-':
+         json.dump(report, sys.stdout, indent=1, sort_keys=True)
+         print('')
+      else:
+         with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+   if args.benchmark == 'startup' and args.max is not None and max(t for name, t in results) > args.max:
+      sys.exit('startup took longer than %s s' % args.max)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+#-----------------------------------------------------------------------------
+# On-disk cache of parsed data files.
+#
+# Each entry is a directory holding the header of the file, one .npy file per
+# column named after its position in the header (categorical columns hold
+# their codes, plus a second file with their levels) and a meta.json
+# recording the size and mtime of the source file.  An entry may hold only
+# some columns; columns saved later are added to it.  An entry whose source
+# has changed is ignored and replaced.  Arrays are memory-mapped when loaded.
+#-----------------------------------------------------------------------------
+
+CACHE_DIR = os.environ.get('QQ_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'qq'))
+VERSION = 2   # of the layout of entries; entries of other versions are ignored
+
+def entry(filename, options):
+   path = os.path.realpath(filename)
+   key = hashlib.sha1(repr((path, options)).encode('utf-8')).hexdigest()
+   return path, os.path.join(CACHE_DIR, key)
+
+def stamp(path):
+   st = os.stat(path)
+   return st.st_size, st.st_mtime
+
+def valid(path, d):
+   try:
+      with open(os.path.join(d, 'meta.json')) as f:
+         meta = json.load(f)
+   except (IOError, OSError, ValueError):
+      return None
+   if meta.get('version') != VERSION or meta['source'] != path or (meta['size'], meta['mtime']) != stamp(path):
+      return None
+   return meta
+
+#-----------------------------------------------------------------------------
+# Return (column names, column arrays, levels, types, subset) or None if the
+# file is not cached, has changed since it was cached, or lacks some of the
+# columns.  levels maps the name of each categorical column to its levels; its
+# array holds the codes.  subset describes the rows read, as given to save.
+#
+# names : columns to load, all the columns of the file by default.
+#-----------------------------------------------------------------------------
+
+def load(filename, options=None, names=None):
+   path, d = entry(filename, options)
+   meta = valid(path, d)
+   if meta is None:
+      return None
+
+   header = np.load(os.path.join(d, 'header.npy')).tolist()
+   cached = { c['index'] : c for c in meta['columns'] }
+   names = header if names is None else names
+   if any(name not in header or header.index(name) not in cached for name in names):
+      return None
+   columns, levels, types = [], {}, {}
+   for name in names:
+      i = header.index(name)
+      columns.append(np.load(os.path.join(d, '%d.npy' % i), mmap_mode='r'))
+      if cached[i]['levels']:
+         levels[name] = [ intern(v) for v in np.load(os.path.join(d, '%d.levels.npy' % i)).tolist() ]
+      types[name] = cached[i]['type']
+   return names, columns, levels, types, meta.get('subset')
+
+#-----------------------------------------------------------------------------
+# header : names of all the columns of the file, of which names are saved.
+# subset : description of the rows read, if not all of them.
+#-----------------------------------------------------------------------------
+
+def save(filename, options, header, names, columns, levels, types, subset=None):
+   path, d = entry(filename, options)
+   size, mtime = stamp(path)
+   if not os.path.isdir(CACHE_DIR):
+      os.makedirs(CACHE_DIR)
+
+   tmp = tempfile.mkdtemp(dir=CACHE_DIR)
+   meta = dict(version=VERSION, source=path, size=size, mtime=mtime, subset=subset, columns=[])
+   np.save(os.path.join(tmp, 'header.npy'), np.array(header, dtype=str))
+   for name, values in zip(names, columns):
+      i = header.index(name)
+      np.save(os.path.join(tmp, '%d.npy' % i), values)
+      if name in levels:
+         np.save(os.path.join(tmp, '%d.levels.npy' % i), np.array(levels[name], dtype=str))
+      meta['columns'].append(dict(index=i, type=types[name], levels=name in levels))
+
+   # keep the other columns of a valid entry
+   old = valid(path, d)
+   if old is not None and np.load(os.path.join(d, 'header.npy')).tolist() == list(header):
+      saved = set(header.index(name) for name in names)
+      for c in old['columns']:
+         if c['index'] not in saved:
+            for f in [ '%d.npy' % c['index'] ] + ([ '%d.levels.npy' % c['index'] ] if c['levels'] else []):
+               link(os.path.join(d, f), os.path.join(tmp, f))
+            meta['columns'].append(c)
+   with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+      json.dump(meta, f)
+
+   shutil.rmtree(d, ignore_errors=True)
+   try:
+      os.rename(tmp, d)
+   except OSError:   # another process cached the file first
+      shutil.rmtree(tmp, ignore_errors=True)
+
+def link(source, target):
+   try:
+      os.link(source, target)
+   except (OSError, AttributeError):
+      shutil.copyfile(source, target)
+
+#-----------------------------------------------------------------------------
+# Remove the cached entries of a file, or the whole cache.
+#-----------------------------------------------------------------------------
+
+def clear(filename=None):
+   if filename is None:
+      shutil.rmtree(CACHE_DIR, ignore_errors=True)
+      return
+   path = os.path.realpath(filename)
+   if not os.path.isdir(CACHE_DIR):
+      return
+   for key in os.listdir(CACHE_DIR):
+      try:
+         with open(os.path.join(CACHE_DIR, key, 'meta.json')) as f:
+            source = json.load(f)['source']
+      except (IOError, OSError, ValueError):
+         continue
+      if source == path:
+         shutil.rmtree(os.path.join(CACHE_DIR, key), ignore_errors=True)
@@ -0,0 +1,153 @@
+import threading
+import Queue
+
+#-----------------------------------------------------------------------------
+# Reading of compressed data files (.gz, .bz2, .xz and, with the zstandard
+# module, .zst).
+#
+# A file is decompressed by a background thread, which puts blocks of
+# BLOCKSIZE bytes in a queue of at most QUEUE_BLOCKS blocks.  Decompression
+# runs while the lines of earlier blocks are parsed, memory stays bounded, and
+# nothing is written to disk.
+#-----------------------------------------------------------------------------
+
+BLOCKSIZE = 1 << 20
+QUEUE_BLOCKS = 8
+
+# Each opener returns the decompressed file, and the compressed file below it
+# when closing the decompressed file leaves that open, or None.
+
+def open_gzip(filename):
+   import gzip
+   return gzip.open(filename, 'rb'), None
+
+def open_bz2(filename):
+   import bz2
+   return bz2.BZ2File(filename, 'rb'), None
+
+def open_xz(filename):
+   try:
+      import lzma
+   except ImportError:
+      try:
+         from backports import lzma
+      except ImportError:
+         raise Exception("Reading %s needs the lzma module (backports.lzma)." % filename)
+   return lzma.LZMAFile(filename, 'rb'), None
+
+def open_zstd(filename):
+   try:
+      import zstandard
+   except ImportError:
+      raise Exception("Reading %s needs the zstandard module." % filename)
+   source = open(filename, 'rb')
+   return zstandard.ZstdDecompressor().stream_reader(source), source
+
+OPENERS = { '.gz' : open_gzip, '.bz2' : open_bz2, '.xz' : open_xz, '.zst' : open_zstd }
+
+# extension of the compression of a file, or None
+def compression(filename):
+   for ext in OPENERS:
+      if filename.endswith(ext):
+         return ext
+   return None
+
+# name of a file without its compression extension
+def inner_name(filename):
+   ext = compression(filename)
+   return filename[:-len(ext)] if ext else filename
+
+# the file, decompressed if it is compressed
+def open_file(filename, mode='rb'):
+   ext = compression(filename)
+   if ext is None:
+      return open(filename, mode)
+   return Decompressed(*OPENERS[ext](filename))
+
+#-----------------------------------------------------------------------------
+# Read-only file of the decompressed bytes of f, supporting read, readline
+# and iteration over lines.  source, if given, is closed after f.
+#-----------------------------------------------------------------------------
+
+class Decompressed(object):
+   def __init__(self, f, source=None):
+      self.queue = Queue.Queue(QUEUE_BLOCKS)
+      self.stopped = threading.Event()
+      self.buffer = ''
+      self.pos = 0
+      self.eof = False
+      self.thread = threading.Thread(target=self.decompress, args=(f, source))
+      self.thread.daemon = True
+      self.thread.start()
+
+   # runs in the background thread; puts blocks, then '' at the end, or the
+   # exception that stopped decompression
+   def decompress(self, f, source):
+      try:
+         with f:
+            while not self.stopped.is_set():
+               block = f.read(BLOCKSIZE)
+               self.put(block)
+               if not block:
+                  break
+      except Exception as e:
+         self.put(e)
+      finally:
+         if source is not None:
+            source.close()
+
+   def put(self, item):
+      while not self.stopped.is_set():
+         try:
+            self.queue.put(item, timeout=0.1)
+            return
+         except Queue.Full:
+            pass
+
+   # add the next block to the unread bytes of the buffer, which start at
+   # pos; False at the end of the file
+   def fill(self):
+      if self.eof:
+         return False
+      block = self.queue.get()
+      if isinstance(block, Exception):
+         self.eof = True
+         raise block
+      if not block:
+         self.eof = True
+         return False
+      self.buffer = self.buffer[self.pos:] + block
+      self.pos = 0
+      return True
+
+   def read(self, size=-1):
+      while (size < 0 or len(self.buffer) - self.pos < size) and self.fill():
+         pass
+      end = len(self.buffer) if size < 0 else self.pos + size
+      data, self.pos = self.buffer[self.pos:end], min(end, len(self.buffer))
+      return data
+
+   def readline(self):
+      start = self.pos
+      while True:
+         end = self.buffer.find('\n', start)
+         if end >= 0:
+            line, self.pos = self.buffer[self.pos:end+1], end + 1
+            return line
+         start = len(self.buffer) - self.pos
+         if not self.fill():
+            line, self.pos = self.buffer[self.pos:], len(self.buffer)
+            return line
+
+   def __iter__(self):
+      return iter(self.readline, '')
+
+   def close(self):
+      self.stopped.set()
+      self.thread.join()
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *exc_info):
+      self.close()
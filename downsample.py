@@ -0,0 +1,42 @@
+import numpy as np
+
+#-----------------------------------------------------------------------------
+# Downsampling of lines for drawing (M4 aggregation).
+#
+# When x (or else y) never decreases or never increases, its range is split
+# into equal buckets and only the first, last, lowest and highest point of
+# each bucket are kept, in their order.  With one bucket per pixel column (or
+# row), the line through the kept points covers the same pixels as the line
+# through all of them.  Other lines, and lines with NaNs, which matplotlib
+# draws as gaps, are left alone.
+#-----------------------------------------------------------------------------
+
+def monotonic(v):
+   d = np.diff(v)
+   return (d >= 0).all() or (d <= 0).all()
+
+def m4(x, y, buckets):
+   x, y = np.asarray(x), np.asarray(y)
+   n = len(x)
+   if buckets < 1 or n <= 4 * buckets or np.isnan(x).any() or np.isnan(y).any():
+      return x, y
+   if monotonic(x):
+      u, v = x, y
+   elif monotonic(y):
+      u, v = y, x
+   else:
+      return x, y
+
+   span = float(u[-1] - u[0]) or 1.0
+   b = np.minimum(((u - u[0]) * (buckets / span)).astype(np.intp), buckets - 1)
+   starts = np.flatnonzero(np.concatenate(([True], b[1:] != b[:-1])))
+   ends = np.concatenate((starts[1:], [n])) - 1
+   bucket = np.repeat(np.arange(len(starts)), ends - starts + 1)
+
+   keep = [ starts, ends ]
+   for reduce in (np.minimum, np.maximum):
+      extreme = reduce.reduceat(v, starts)
+      at = np.flatnonzero(v == extreme[bucket])
+      keep.append(at[np.unique(bucket[at], return_index=True)[1]])
+   keep = np.unique(np.concatenate(keep))
+   return x[keep], y[keep]
@@ -0,0 +1,159 @@
+import numpy as np
+from sketch import Sketch
+
+#-----------------------------------------------------------------------------
+# Rows grouped by a combination of key columns.
+#
+# Each key is given as (codes, number of levels); a key of None puts every row
+# in a single level.  The keys of a row combine into one cell code, and all
+# statistics are reductions over cell codes: np.bincount for counts, sums and
+# means, and one sort for row partitions and quartiles.  Results are arrays
+# of shape (levels of key 1, levels of key 2, ...), indexed by level codes.
+#
+# weights : number of rows each row stands for, for summarized data.  Value
+#   columns of summarized data already hold sums, so weights only enter counts.
+#-----------------------------------------------------------------------------
+
+class GroupBy(object):
+   def __init__(self, keys, nrow, weights=None):
+      self.shape = tuple(1 if k is None else k[1] for k in keys)
+      self.size = int(np.prod(self.shape))
+      self.weights = weights
+      self.cell = np.zeros(nrow, dtype=np.intp)
+      for k, n in zip(keys, self.shape):
+         self.cell *= n
+         if k is not None:
+            self.cell += k[0]
+      self.rows = np.bincount(self.cell, minlength=self.size)
+      self.starts = np.concatenate(([0], np.cumsum(self.rows)))
+      self._order = None
+
+   def count(self):
+      if self.weights is None:
+         return self.rows.reshape(self.shape)
+      return np.bincount(self.cell, weights=self.weights, minlength=self.size).reshape(self.shape)
+
+   def sum(self, values):
+      return np.bincount(self.cell, weights=values, minlength=self.size).reshape(self.shape)
+
+   #--------------------------------------------------------------------------
+   # count, sum and mean of values in every cell; mean is 0 in empty cells.
+   # With sem, also the standard error of the mean, from the squared
+   # deviations from the mean of each cell; it is NaN in cells of fewer than
+   # two rows.  Summarized data hold sums, so they have no standard errors.
+   #--------------------------------------------------------------------------
+   def aggregate(self, values=None, sem=False):
+      count = self.count()
+      result = dict(count=count)
+      if values is not None:
+         result['sum'] = self.sum(values)
+         result['mean'] = result['sum'] / np.maximum(count, 1)
+         if sem:
+            if self.weights is not None:
+               raise Exception("Standard errors cannot be computed from summarized data.")
+            deviation = values - result['mean'].ravel()[self.cell]
+            squares = np.bincount(self.cell, weights=deviation * deviation, minlength=self.size).reshape(self.shape)
+            with np.errstate(divide='ignore', invalid='ignore'):
+               result['sem'] = np.where(count > 1, np.sqrt(squares / (count - 1) / count), np.nan)
+      return result
+
+   #--------------------------------------------------------------------------
+   # Counts of values in every cell over the same bins, as np.histogram counts
+   # them: the last bin includes its right edge, and values outside the edges
+   # or NaN are left out.  Returns an array of shape + (number of bins,).
+   #--------------------------------------------------------------------------
+   def histogram(self, values, edges):
+      nbins = len(edges) - 1
+      bins = np.searchsorted(edges, values, side='right') - 1
+      bins[values == edges[-1]] = nbins - 1
+      inside = (bins >= 0) & (bins < nbins)
+      weights = self.weights[inside] if self.weights is not None else None
+      counts = np.bincount(self.cell[inside] * nbins + bins[inside], weights=weights, minlength=self.size * nbins)
+      return counts.reshape(self.shape + (nbins,))
+
+   #--------------------------------------------------------------------------
+   # Row indices of a cell, given as a tuple of level codes.  A tuple of codes
+   # for the first keys only selects the rows of all cells it prefixes.  Rows
+   # are ordered by cell, then by row.
+   #--------------------------------------------------------------------------
+   def indices(self, cell):
+      if self._order is None:
+         self._order = np.argsort(self.cell, kind='mergesort')
+      span = int(np.prod(self.shape[len(cell):]))
+      k = np.ravel_multi_index(cell, self.shape[:len(cell)]) * span
+      return self._order[self.starts[k]:self.starts[k+span]]
+
+   #--------------------------------------------------------------------------
+   # Box plot statistics of values in every cell, as the dictionaries that
+   # Axes.bxp draws and computed as matplotlib.cbook.boxplot_stats does:
+   # whiskers reach the most extreme values within whis * IQR of the box.
+   #--------------------------------------------------------------------------
+   def quartiles(self, values, whis=1.5):
+      order = np.lexsort((values, self.cell))
+      v = np.asarray(values, dtype=np.float64)[order]
+      cells = self.cell[order]
+      n = self.rows
+      full = n > 0
+      starts = self.starts[:-1][full]
+
+      def percentile(q):
+         pos = q * (n[full] - 1)
+         below = np.floor(pos).astype(np.intp)
+         above = np.minimum(below + 1, n[full] - 1)
+         w = pos - below
+         return v[starts + below] * (1 - w) + v[starts + above] * w
+
+      nan = np.full(self.size, np.nan)
+      q1, med, q3 = nan.copy(), nan.copy(), nan.copy()
+      q1[full], med[full], q3[full] = percentile(0.25), percentile(0.5), percentile(0.75)
+      iqr = q3 - q1
+      mean = np.bincount(cells, weights=v, minlength=self.size) / np.maximum(n, 1)
+
+      whishi, whislo = q3.copy(), q1.copy()
+      if len(starts):
+         hi = np.maximum.reduceat(np.where(v <= (q3 + whis*iqr)[cells], v, -np.inf), starts)
+         lo = np.minimum.reduceat(np.where(v >= (q1 - whis*iqr)[cells], v, np.inf), starts)
+         whishi[full] = np.maximum(hi, q3[full])
+         whislo[full] = np.minimum(lo, q1[full])
+
+      outside = (v < whislo[cells]) | (v > whishi[cells])
+      bounds = np.cumsum(np.bincount(cells[outside], minlength=self.size))
+      fliers = np.split(v[outside], bounds[:-1])
+
+      ci = 1.57 * iqr / np.sqrt(np.maximum(n, 1))
+      stats = np.empty(self.size, dtype=object)
+      for k in range(self.size):
+         stats[k] = dict(mean=mean[k] if n[k] else np.nan, med=med[k], q1=q1[k], q3=q3[k],
+            iqr=iqr[k], cilo=med[k]-ci[k], cihi=med[k]+ci[k], whislo=whislo[k], whishi=whishi[k], fliers=fliers[k])
+      return stats.reshape(self.shape)
+
+   #--------------------------------------------------------------------------
+   # One quantile Sketch of values per cell, fed chunksize rows at a time;
+   # empty cells get None.
+   #--------------------------------------------------------------------------
+   def sketch(self, values, error=0.01, chunksize=1000000):
+      sketches = np.empty(self.size, dtype=object)
+      for start in range(0, len(values), chunksize):
+         cells = self.cell[start:start+chunksize]
+         order = np.argsort(cells, kind='mergesort')
+         v = np.asarray(values[start:start+chunksize])[order]
+         bounds = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=self.size))))
+         for k in np.flatnonzero(bounds[1:] > bounds[:-1]):
+            if sketches[k] is None:
+               sketches[k] = Sketch(error)
+            sketches[k].update(v[bounds[k]:bounds[k+1]])
+      return sketches.reshape(self.shape)
+
+   #--------------------------------------------------------------------------
+   # Merge one Sketch per row, as kept by summarized data, into one per cell.
+   #--------------------------------------------------------------------------
+   def merge(self, sketches):
+      if self._order is None:
+         self._order = np.argsort(self.cell, kind='mergesort')
+      result = np.empty(self.size, dtype=object)
+      for k in np.flatnonzero(self.rows):
+         for r in self._order[self.starts[k]:self.starts[k+1]]:
+            if result[k] is None:
+               result[k] = Sketch(2.0 / sketches[r].k)
+            result[k].merge(sketches[r])
+      return result.reshape(self.shape)
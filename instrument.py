@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+#-----------------------------------------------------------------------------
+# Instrumentation of the stages of reading and plotting.
+#
+# Stages are marked with "with stage(name, rows=..., ...) as info:"; counts
+# only known inside the block can be added to info.  When hooks are
+# registered, every stage calls each hook with a record holding its name,
+# start time and duration in seconds, change in resident memory in bytes,
+# nesting depth and counts (rows, groups, facets, ...).  Without hooks, stages
+# cost next to nothing.
+#-----------------------------------------------------------------------------
+
+HOOKS = []
+
+def add_hook(hook):
+   HOOKS.append(hook)
+
+def remove_hook(hook):
+   HOOKS.remove(hook)
+
+#-----------------------------------------------------------------------------
+# Resident set size of this process in bytes: current on Linux, peak
+# elsewhere.
+#-----------------------------------------------------------------------------
+
+def rss():
+   try:
+      with open('/proc/self/statm') as f:
+         return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+   except (IOError, OSError, ValueError):
+      try:
+         import resource
+         return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+      except ImportError:
+         return 0
+
+#-----------------------------------------------------------------------------
+
+class stage(object):
+   depth = 0
+
+   def __init__(self, name, **info):
+      self.name = name
+      self.info = info
+      self.start = None
+
+   def __enter__(self):
+      if HOOKS:
+         self.memory = rss()
+         self.depth = stage.depth
+         stage.depth += 1
+         self.start = time.time()
+      return self.info
+
+   def __exit__(self, *exc_info):
+      if self.start is not None:
+         seconds = time.time() - self.start
+         stage.depth -= 1
+         record = dict(self.info, stage=self.name, start=self.start, seconds=seconds,
+            memory=rss() - self.memory, depth=self.depth)
+         for hook in HOOKS:
+            hook(record)
+      return False
+
+#-----------------------------------------------------------------------------
+# Hook keeping every record, to print a summary table or save a trace.
+#-----------------------------------------------------------------------------
+
+class Profiler(object):
+   def __init__(self):
+      self.records = []
+
+   def __call__(self, record):
+      self.records.append(record)
+
+   #--------------------------------------------------------------------------
+   # One line per stage, in the order stages first started, with the number of
+   # calls, total seconds, total memory change and the largest counts.
+   #--------------------------------------------------------------------------
+   def summary(self):
+      stages = {}
+      for r in self.records:
+         if r['stage'] not in stages:
+            stages[r['stage']] = dict(depth=r['depth'], start=r['start'], calls=0, seconds=0.0, memory=0)
+         s = stages[r['stage']]
+         s['start'] = min(s['start'], r['start'])
+         s['calls'] += 1
+         s['seconds'] += r['seconds']
+         s['memory'] += r['memory']
+         for k in ('rows', 'groups', 'facets'):
+            if r.get(k) is not None:
+               s[k] = max(s.get(k, 0), r[k])
+
+      lines = [ '%-30s %6s %10s %10s %10s %7s %7s' % ('stage', 'calls', 'seconds', 'memory MB', 'rows', 'groups', 'facets') ]
+      for name in sorted(stages, key=lambda name: stages[name]['start']):
+         s = stages[name]
+         lines.append('%-30s %6d %10.3f %10.1f %10s %7s %7s' % ('  '*s['depth'] + name, s['calls'], s['seconds'],
+            s['memory'] / 1e6, s.get('rows', ''), s.get('groups', ''), s.get('facets', '')))
+      return '\n'.join(lines)
+
+   #--------------------------------------------------------------------------
+   # Save the records as a trace in the Trace Event Format, which
+   # chrome://tracing and Perfetto display as a timeline.
+   #--------------------------------------------------------------------------
+   def save(self, filename):
+      events = []
+      for r in self.records:
+         args = { k : v for k, v in r.items() if k not in ('stage', 'start', 'seconds') }
+         events.append(dict(name=r['stage'], ph='X', ts=r['start']*1e6, dur=r['seconds']*1e6,
+            pid=os.getpid(), tid=0, args=args))
+      with open(filename, 'w') as f:
+         json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
@@ -0,0 +1,293 @@
+'''
+ColorBrewer palettes, generated from colorbrewer_all_schemes.json by running
+this module: python palettes.py
+'''
+
+#-----------------------------------------------------------------------------
+# PALETTES[color type][theme][number of colors] is a string of 6-digit hex
+# RGB colors, one after the other.
+#-----------------------------------------------------------------------------
+
+PALETTES = {'Diverging': {'BrBG': {3: 'd8b365f5f5f55ab4ac',
+                        4: 'a6611adfc27d80cdc1018571',
+                        5: 'a6611adfc27df5f5f580cdc1018571',
+                        6: '8c510ad8b365f6e8c3c7eae55ab4ac01665e',
+                        7: '8c510ad8b365f6e8c3f5f5f5c7eae55ab4ac01665e',
+                        8: '8c510abf812ddfc27df6e8c3c7eae580cdc135978f01665e',
+                        9: '8c510abf812ddfc27df6e8c3f5f5f5c7eae580cdc135978f01665e',
+                        10: '5430058c510abf812ddfc27df6e8c3c7eae580cdc135978f01665e003c30',
+                        11: '5430058c510abf812ddfc27df6e8c3f5f5f5c7eae580cdc135978f01665e003c30'},
+               'PRGn': {3: 'af8dc3f7f7f77fbf7b',
+                        4: '7b3294c2a5cfa6dba0008837',
+                        5: '7b3294c2a5cff7f7f7a6dba0008837',
+                        6: '762a83af8dc3e7d4e8d9f0d37fbf7b1b7837',
+                        7: '762a83af8dc3e7d4e8f7f7f7d9f0d37fbf7b1b7837',
+                        8: '762a839970abc2a5cfe7d4e8d9f0d3a6dba05aae611b7837',
+                        9: '762a839970abc2a5cfe7d4e8f7f7f7d9f0d3a6dba05aae611b7837',
+                        10: '40004b762a839970abc2a5cfe7d4e8d9f0d3a6dba05aae611b783700441b',
+                        11: '40004b762a839970abc2a5cfe7d4e8f7f7f7d9f0d3a6dba05aae611b783700441b'},
+               'PiYG': {3: 'e9a3c9f7f7f7a1d76a',
+                        4: 'd01c8bf1b6dab8e1864dac26',
+                        5: 'd01c8bf1b6daf7f7f7b8e1864dac26',
+                        6: 'c51b7de9a3c9fde0efe6f5d0a1d76a4d9221',
+                        7: 'c51b7de9a3c9fde0eff7f7f7e6f5d0a1d76a4d9221',
+                        8: 'c51b7dde77aef1b6dafde0efe6f5d0b8e1867fbc414d9221',
+                        9: 'c51b7dde77aef1b6dafde0eff7f7f7e6f5d0b8e1867fbc414d9221',
+                        10: '8e0152c51b7dde77aef1b6dafde0efe6f5d0b8e1867fbc414d9221276419',
+                        11: '8e0152c51b7dde77aef1b6dafde0eff7f7f7e6f5d0b8e1867fbc414d9221276419'},
+               'PuOr': {3: 'f1a340f7f7f7998ec3',
+                        4: 'e66101fdb863b2abd25e3c99',
+                        5: 'e66101fdb863f7f7f7b2abd25e3c99',
+                        6: 'b35806f1a340fee0b6d8daeb998ec3542788',
+                        7: 'b35806f1a340fee0b6f7f7f7d8daeb998ec3542788',
+                        8: 'b35806e08214fdb863fee0b6d8daebb2abd28073ac542788',
+                        9: 'b35806e08214fdb863fee0b6f7f7f7d8daebb2abd28073ac542788',
+                        10: '7f3b08b35806e08214fdb863fee0b6d8daebb2abd28073ac5427882d004b',
+                        11: '7f3b08b35806e08214fdb863fee0b6f7f7f7d8daebb2abd28073ac5427882d004b'},
+               'RdBu': {3: 'ef8a62f7f7f767a9cf',
+                        4: 'ca0020f4a58292c5de0571b0',
+                        5: 'ca0020f4a582f7f7f792c5de0571b0',
+                        6: 'b2182bef8a62fddbc7d1e5f067a9cf2166ac',
+                        7: 'b2182bef8a62fddbc7f7f7f7d1e5f067a9cf2166ac',
+                        8: 'b2182bd6604df4a582fddbc7d1e5f092c5de4393c32166ac',
+                        9: 'b2182bd6604df4a582fddbc7f7f7f7d1e5f092c5de4393c32166ac',
+                        10: '67001fb2182bd6604df4a582fddbc7d1e5f092c5de4393c32166ac053061',
+                        11: '67001fb2182bd6604df4a582fddbc7f7f7f7d1e5f092c5de4393c32166ac053061'},
+               'RdGy': {3: 'ef8a62ffffff999999',
+                        4: 'ca0020f4a582bababa404040',
+                        5: 'ca0020f4a582ffffffbababa404040',
+                        6: 'b2182bef8a62fddbc7e0e0e09999994d4d4d',
+                        7: 'b2182bef8a62fddbc7ffffffe0e0e09999994d4d4d',
+                        8: 'b2182bd6604df4a582fddbc7e0e0e0bababa8787874d4d4d',
+                        9: 'b2182bd6604df4a582fddbc7ffffffe0e0e0bababa8787874d4d4d',
+                        10: '67001fb2182bd6604df4a582fddbc7e0e0e0bababa8787874d4d4d1a1a1a',
+                        11: '67001fb2182bd6604df4a582fddbc7ffffffe0e0e0bababa8787874d4d4d1a1a1a'},
+               'RdYlBu': {3: 'fc8d59ffffbf91bfdb',
+                          4: 'd7191cfdae61abd9e92c7bb6',
+                          5: 'd7191cfdae61ffffbfabd9e92c7bb6',
+                          6: 'd73027fc8d59fee090e0f3f891bfdb4575b4',
+                          7: 'd73027fc8d59fee090ffffbfe0f3f891bfdb4575b4',
+                          8: 'd73027f46d43fdae61fee090e0f3f8abd9e974add14575b4',
+                          9: 'd73027f46d43fdae61fee090ffffbfe0f3f8abd9e974add14575b4',
+                          10: 'a50026d73027f46d43fdae61fee090e0f3f8abd9e974add14575b4313695',
+                          11: 'a50026d73027f46d43fdae61fee090ffffbfe0f3f8abd9e974add14575b4313695'},
+               'RdYlGn': {3: 'fc8d59ffffbf91cf60',
+                          4: 'd7191cfdae61a6d96a1a9641',
+                          5: 'd7191cfdae61ffffbfa6d96a1a9641',
+                          6: 'd73027fc8d59fee08bd9ef8b91cf601a9850',
+                          7: 'd73027fc8d59fee08bffffbfd9ef8b91cf601a9850',
+                          8: 'd73027f46d43fdae61fee08bd9ef8ba6d96a66bd631a9850',
+                          9: 'd73027f46d43fdae61fee08bffffbfd9ef8ba6d96a66bd631a9850',
+                          10: 'a50026d73027f46d43fdae61fee08bd9ef8ba6d96a66bd631a9850006837',
+                          11: 'a50026d73027f46d43fdae61fee08bffffbfd9ef8ba6d96a66bd631a9850006837'},
+               'Spectral': {3: 'fc8d59ffffbf99d594',
+                            4: 'd7191cfdae61abdda42b83ba',
+                            5: 'd7191cfdae61ffffbfabdda42b83ba',
+                            6: 'd53e4ffc8d59fee08be6f59899d5943288bd',
+                            7: 'd53e4ffc8d59fee08bffffbfe6f59899d5943288bd',
+                            8: 'd53e4ff46d43fdae61fee08be6f598abdda466c2a53288bd',
+                            9: 'd53e4ff46d43fdae61fee08bffffbfe6f598abdda466c2a53288bd',
+                            10: '9e0142d53e4ff46d43fdae61fee08be6f598abdda466c2a53288bd5e4fa2',
+                            11: '9e0142d53e4ff46d43fdae61fee08bffffbfe6f598abdda466c2a53288bd5e4fa2'}},
+ 'Qualitative': {'Accent': {3: '7fc97fbeaed4fdc086',
+                            4: '7fc97fbeaed4fdc086ffff99',
+                            5: '7fc97fbeaed4fdc086ffff99386cb0',
+                            6: '7fc97fbeaed4fdc086ffff99386cb0f0027f',
+                            7: '7fc97fbeaed4fdc086ffff99386cb0f0027fbf5b17',
+                            8: '7fc97fbeaed4fdc086ffff99386cb0f0027fbf5b17666666'},
+                 'Dark2': {3: '1b9e77d95f027570b3',
+                           4: '1b9e77d95f027570b3e7298a',
+                           5: '1b9e77d95f027570b3e7298a66a61e',
+                           6: '1b9e77d95f027570b3e7298a66a61ee6ab02',
+                           7: '1b9e77d95f027570b3e7298a66a61ee6ab02a6761d',
+                           8: '1b9e77d95f027570b3e7298a66a61ee6ab02a6761d666666'},
+                 'Paired': {3: 'a6cee31f78b4b2df8a',
+                            4: 'a6cee31f78b4b2df8a33a02c',
+                            5: 'a6cee31f78b4b2df8a33a02cfb9a99',
+                            6: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1c',
+                            7: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6f',
+                            8: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00',
+                            9: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00cab2d6',
+                            10: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00cab2d66a3d9a',
+                            11: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00cab2d66a3d9affff99',
+                            12: 'a6cee31f78b4b2df8a33a02cfb9a99e31a1cfdbf6fff7f00cab2d66a3d9affff99b15928'},
+                 'Pastel1': {3: 'fbb4aeb3cde3ccebc5',
+                             4: 'fbb4aeb3cde3ccebc5decbe4',
+                             5: 'fbb4aeb3cde3ccebc5decbe4fed9a6',
+                             6: 'fbb4aeb3cde3ccebc5decbe4fed9a6ffffcc',
+                             7: 'fbb4aeb3cde3ccebc5decbe4fed9a6ffffcce5d8bd',
+                             8: 'fbb4aeb3cde3ccebc5decbe4fed9a6ffffcce5d8bdfddaec',
+                             9: 'fbb4aeb3cde3ccebc5decbe4fed9a6ffffcce5d8bdfddaecf2f2f2'},
+                 'Pastel2': {3: 'b3e2cdfdcdaccbd5e8',
+                             4: 'b3e2cdfdcdaccbd5e8f4cae4',
+                             5: 'b3e2cdfdcdaccbd5e8f4cae4e6f5c9',
+                             6: 'b3e2cdfdcdaccbd5e8f4cae4e6f5c9fff2ae',
+                             7: 'b3e2cdfdcdaccbd5e8f4cae4e6f5c9fff2aef1e2cc',
+                             8: 'b3e2cdfdcdaccbd5e8f4cae4e6f5c9fff2aef1e2cccccccc'},
+                 'Set1': {3: 'e41a1c377eb84daf4a',
+                          4: 'e41a1c377eb84daf4a984ea3',
+                          5: 'e41a1c377eb84daf4a984ea3ff7f00',
+                          6: 'e41a1c377eb84daf4a984ea3ff7f00ffff33',
+                          7: 'e41a1c377eb84daf4a984ea3ff7f00ffff33a65628',
+                          8: 'e41a1c377eb84daf4a984ea3ff7f00ffff33a65628f781bf',
+                          9: 'e41a1c377eb84daf4a984ea3ff7f00ffff33a65628f781bf999999'},
+                 'Set2': {3: '66c2a5fc8d628da0cb',
+                          4: '66c2a5fc8d628da0cbe78ac3',
+                          5: '66c2a5fc8d628da0cbe78ac3a6d854',
+                          6: '66c2a5fc8d628da0cbe78ac3a6d854ffd92f',
+                          7: '66c2a5fc8d628da0cbe78ac3a6d854ffd92fe5c494',
+                          8: '66c2a5fc8d628da0cbe78ac3a6d854ffd92fe5c494b3b3b3'},
+                 'Set3': {3: '8dd3c7ffffb3bebada',
+                          4: '8dd3c7ffffb3bebadafb8072',
+                          5: '8dd3c7ffffb3bebadafb807280b1d3',
+                          6: '8dd3c7ffffb3bebadafb807280b1d3fdb462',
+                          7: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69',
+                          8: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69fccde5',
+                          9: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69fccde5d9d9d9',
+                          10: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69fccde5d9d9d9bc80bd',
+                          11: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69fccde5d9d9d9bc80bdccebc5',
+                          12: '8dd3c7ffffb3bebadafb807280b1d3fdb462b3de69fccde5d9d9d9bc80bdccebc5ffed6f'}},
+ 'Sequential': {'Blues': {3: 'deebf79ecae13182bd',
+                          4: 'eff3ffbdd7e76baed62171b5',
+                          5: 'eff3ffbdd7e76baed63182bd08519c',
+                          6: 'eff3ffc6dbef9ecae16baed63182bd08519c',
+                          7: 'eff3ffc6dbef9ecae16baed64292c62171b5084594',
+                          8: 'f7fbffdeebf7c6dbef9ecae16baed64292c62171b5084594',
+                          9: 'f7fbffdeebf7c6dbef9ecae16baed64292c62171b508519c08306b'},
+                'BuGn': {3: 'e5f5f999d8c92ca25f',
+                         4: 'edf8fbb2e2e266c2a4238b45',
+                         5: 'edf8fbb2e2e266c2a42ca25f006d2c',
+                         6: 'edf8fbccece699d8c966c2a42ca25f006d2c',
+                         7: 'edf8fbccece699d8c966c2a441ae76238b45005824',
+                         8: 'f7fcfde5f5f9ccece699d8c966c2a441ae76238b45005824',
+                         9: 'f7fcfde5f5f9ccece699d8c966c2a441ae76238b45006d2c00441b'},
+                'BuPu': {3: 'e0ecf49ebcda8856a7',
+                         4: 'edf8fbb3cde38c96c688419d',
+                         5: 'edf8fbb3cde38c96c68856a7810f7c',
+                         6: 'edf8fbbfd3e69ebcda8c96c68856a7810f7c',
+                         7: 'edf8fbbfd3e69ebcda8c96c68c6bb188419d6e016b',
+                         8: 'f7fcfde0ecf4bfd3e69ebcda8c96c68c6bb188419d6e016b',
+                         9: 'f7fcfde0ecf4bfd3e69ebcda8c96c68c6bb188419d810f7c4d004b'},
+                'GnBu': {3: 'e0f3dba8ddb543a2ca',
+                         4: 'f0f9e8bae4bc7bccc42b8cbe',
+                         5: 'f0f9e8bae4bc7bccc443a2ca0868ac',
+                         6: 'f0f9e8ccebc5a8ddb57bccc443a2ca0868ac',
+                         7: 'f0f9e8ccebc5a8ddb57bccc44eb3d32b8cbe08589e',
+                         8: 'f7fcf0e0f3dbccebc5a8ddb57bccc44eb3d32b8cbe08589e',
+                         9: 'f7fcf0e0f3dbccebc5a8ddb57bccc44eb3d32b8cbe0868ac084081'},
+                'Greens': {3: 'e5f5e0a1d99b31a354',
+                           4: 'edf8e9bae4b374c476238b45',
+                           5: 'edf8e9bae4b374c47631a354006d2c',
+                           6: 'edf8e9c7e9c0a1d99b74c47631a354006d2c',
+                           7: 'edf8e9c7e9c0a1d99b74c47641ab5d238b45005a32',
+                           8: 'f7fcf5e5f5e0c7e9c0a1d99b74c47641ab5d238b45005a32',
+                           9: 'f7fcf5e5f5e0c7e9c0a1d99b74c47641ab5d238b45006d2c00441b'},
+                'Greys': {3: 'f0f0f0bdbdbd636363',
+                          4: 'f7f7f7cccccc969696525252',
+                          5: 'f7f7f7cccccc969696636363252525',
+                          6: 'f7f7f7d9d9d9bdbdbd969696636363252525',
+                          7: 'f7f7f7d9d9d9bdbdbd969696737373525252252525',
+                          8: 'fffffff0f0f0d9d9d9bdbdbd969696737373525252252525',
+                          9: 'fffffff0f0f0d9d9d9bdbdbd969696737373525252252525000000'},
+                'OrRd': {3: 'fee8c8fdbb84e34a33',
+                         4: 'fef0d9fdcc8afc8d59d7301f',
+                         5: 'fef0d9fdcc8afc8d59e34a33b30000',
+                         6: 'fef0d9fdd49efdbb84fc8d59e34a33b30000',
+                         7: 'fef0d9fdd49efdbb84fc8d59ef6548d7301f990000',
+                         8: 'fff7ecfee8c8fdd49efdbb84fc8d59ef6548d7301f990000',
+                         9: 'fff7ecfee8c8fdd49efdbb84fc8d59ef6548d7301fb300007f0000'},
+                'Oranges': {3: 'fee6cefdae6be6550d',
+                            4: 'feeddefdbe85fd8d3cd94701',
+                            5: 'feeddefdbe85fd8d3ce6550da63603',
+                            6: 'feeddefdd0a2fdae6bfd8d3ce6550da63603',
+                            7: 'feeddefdd0a2fdae6bfd8d3cf16913d948018c2d04',
+                            8: 'fff5ebfee6cefdd0a2fdae6bfd8d3cf16913d948018c2d04',
+                            9: 'fff5ebfee6cefdd0a2fdae6bfd8d3cf16913d94801a636037f2704'},
+                'PuBu': {3: 'ece7f2a6bddb2b8cbe',
+                         4: 'f1eef6bdc9e174a9cf0570b0',
+                         5: 'f1eef6bdc9e174a9cf2b8cbe045a8d',
+                         6: 'f1eef6d0d1e6a6bddb74a9cf2b8cbe045a8d',
+                         7: 'f1eef6d0d1e6a6bddb74a9cf3690c00570b0034e7b',
+                         8: 'fff7fbece7f2d0d1e6a6bddb74a9cf3690c00570b0034e7b',
+                         9: 'fff7fbece7f2d0d1e6a6bddb74a9cf3690c00570b0045a8d023858'},
+                'PuBuGn': {3: 'ece2f0a6bddb1c9099',
+                           4: 'f6eff7bdc9e167a9cf02818a',
+                           5: 'f6eff7bdc9e167a9cf1c9099016c59',
+                           6: 'f6eff7d0d1e6a6bddb67a9cf1c9099016c59',
+                           7: 'f6eff7d0d1e6a6bddb67a9cf3690c002818a016450',
+                           8: 'fff7fbece2f0d0d1e6a6bddb67a9cf3690c002818a016450',
+                           9: 'fff7fbece2f0d0d1e6a6bddb67a9cf3690c002818a016c59014636'},
+                'PuRd': {3: 'e7e1efc994c7dd1c77',
+                         4: 'f1eef6d7b5d8df65b0ce1256',
+                         5: 'f1eef6d7b5d8df65b0dd1c77980043',
+                         6: 'f1eef6d4b9dac994c7df65b0dd1c77980043',
+                         7: 'f1eef6d4b9dac994c7df65b0e7298ace125691003f',
+                         8: 'f7f4f9e7e1efd4b9dac994c7df65b0e7298ace125691003f',
+                         9: 'f7f4f9e7e1efd4b9dac994c7df65b0e7298ace125698004367001f'},
+                'Purples': {3: 'efedf5bcbddc756bb1',
+                            4: 'f2f0f7cbc9e29e9ac86a51a3',
+                            5: 'f2f0f7cbc9e29e9ac8756bb154278f',
+                            6: 'f2f0f7dadaebbcbddc9e9ac8756bb154278f',
+                            7: 'f2f0f7dadaebbcbddc9e9ac8807dba6a51a34a1486',
+                            8: 'fcfbfdefedf5dadaebbcbddc9e9ac8807dba6a51a34a1486',
+                            9: 'fcfbfdefedf5dadaebbcbddc9e9ac8807dba6a51a354278f3f007d'},
+                'RdPu': {3: 'fde0ddfa9fb5c51b8a',
+                         4: 'feebe2fbb4b9f768a1ae017e',
+                         5: 'feebe2fbb4b9f768a1c51b8a7a0177',
+                         6: 'feebe2fcc5c0fa9fb5f768a1c51b8a7a0177',
+                         7: 'feebe2fcc5c0fa9fb5f768a1dd3497ae017e7a0177',
+                         8: 'fff7f3fde0ddfcc5c0fa9fb5f768a1dd3497ae017e7a0177',
+                         9: 'fff7f3fde0ddfcc5c0fa9fb5f768a1dd3497ae017e7a017749006a'},
+                'Reds': {3: 'fee0d2fc9272de2d26',
+                         4: 'fee5d9fcae91fb6a4acb181d',
+                         5: 'fee5d9fcae91fb6a4ade2d26a50f15',
+                         6: 'fee5d9fcbba1fc9272fb6a4ade2d26a50f15',
+                         7: 'fee5d9fcbba1fc9272fb6a4aef3b2ccb181d99000d',
+                         8: 'fff5f0fee0d2fcbba1fc9272fb6a4aef3b2ccb181d99000d',
+                         9: 'fff5f0fee0d2fcbba1fc9272fb6a4aef3b2ccb181da50f1567000d'},
+                'YlGn': {3: 'f7fcb9addd8e31a354',
+                         4: 'ffffccc2e69978c679238443',
+                         5: 'ffffccc2e69978c67931a354006837',
+                         6: 'ffffccd9f0a3addd8e78c67931a354006837',
+                         7: 'ffffccd9f0a3addd8e78c67941ab5d238443005a32',
+                         8: 'ffffe5f7fcb9d9f0a3addd8e78c67941ab5d238443005a32',
+                         9: 'ffffe5f7fcb9d9f0a3addd8e78c67941ab5d238443006837004529'},
+                'YlGnBu': {3: 'edf8b17fcdbb2c7fb8',
+                           4: 'ffffcca1dab441b6c4225ea8',
+                           5: 'ffffcca1dab441b6c42c7fb8253494',
+                           6: 'ffffccc7e9b47fcdbb41b6c42c7fb8253494',
+                           7: 'ffffccc7e9b47fcdbb41b6c41d91c0225ea80c2c84',
+                           8: 'ffffd9edf8b1c7e9b47fcdbb41b6c41d91c0225ea80c2c84',
+                           9: 'ffffd9edf8b1c7e9b47fcdbb41b6c41d91c0225ea8253494081d58'},
+                'YlOrBr': {3: 'fff7bcfec44fd95f0e',
+                           4: 'ffffd4fed98efe9929cc4c02',
+                           5: 'ffffd4fed98efe9929d95f0e993404',
+                           6: 'ffffd4fee391fec44ffe9929d95f0e993404',
+                           7: 'ffffd4fee391fec44ffe9929ec7014cc4c028c2d04',
+                           8: 'ffffe5fff7bcfee391fec44ffe9929ec7014cc4c028c2d04',
+                           9: 'ffffe5fff7bcfee391fec44ffe9929ec7014cc4c02993404662506'},
+                'YlOrRd': {3: 'ffeda0feb24cf03b20',
+                           4: 'ffffb2fecc5cfd8d3ce31a1c',
+                           5: 'ffffb2fecc5cfd8d3cf03b20bd0026',
+                           6: 'ffffb2fed976feb24cfd8d3cf03b20bd0026',
+                           7: 'ffffb2fed976feb24cfd8d3cfc4e2ae31a1cb10026',
+                           8: 'ffffccffeda0fed976feb24cfd8d3cfc4e2ae31a1cb10026',
+                           9: 'ffffccffeda0fed976feb24cfd8d3cfc4e2ae31a1cbd0026800026'}}}
+
+if __name__ == '__main__':
+   import json, os, pprint
+   here = os.path.dirname(os.path.abspath(__file__))
+   with open(os.path.join(here, 'colorbrewer_all_schemes.json')) as f:
+      schemes = json.load(f)
+   palettes = {}
+   for color_type, themes in schemes.items():
+      for theme, sizes in themes.items():
+         for n, scheme in sizes.items():
+            palettes.setdefault(str(color_type), {}).setdefault(str(theme), {})[int(n)] = \
+               ''.join('%02x%02x%02x' % tuple(c) for c in scheme['Colors'])
+   with open(os.path.join(here, 'palettes.py')) as f:
+      src = f.read()
+   head, tail = src.split('\nPALETTES = ', 1)
+   tail = tail[tail.index('\n\nif __name__'):]
+   with open(os.path.join(here, 'palettes.py'), 'w') as f:
+      f.write(head + '\nPALETTES = ' + pprint.pformat(palettes, width=100) + tail)
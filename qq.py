@@ -2,58 +2,579 @@
 Author: Vinhthuy Phan, 2014
 '''
 import csv
+import collections
+import itertools
+import os
 import re
+import sys
+import time
 import keyword
-import matplotlib.pyplot as plt
+import operator
 import numpy as np
 import math
+import cache
+import compressed
 from utils import *
+from stream import Summary
+from groupby import GroupBy
+from sketch import boxplot_stats
+from downsample import m4
+from instrument import stage
 
-from matplotlib import style, cm
-style.use('ggplot')
 color = Color()
 
+#---------------------------------------------------------------------------------
+# matplotlib takes long to import, so it is imported when the first plot is drawn
+#---------------------------------------------------------------------------------
+
+plt = None
+
+def load_matplotlib():
+   global plt, cm, LinearSegmentedColormap, LogNorm, Normalize
+   if plt is None:
+      import matplotlib.pyplot as plt
+      from matplotlib import style, cm
+      from matplotlib.colors import LinearSegmentedColormap, LogNorm, Normalize
+      style.use('ggplot')
+      # lines too long to downsample are drawn in pieces, rather than
+      # exceeding the cell block limit of Agg
+      if not plt.rcParams['agg.path.chunksize']:
+         plt.rcParams['agg.path.chunksize'] = 20000
+
 #---------------------------------------------------------------------------------
 # read a delimited file and return a plot referenced to "data" based on this file
+#
+# columns : names of the columns to read, all of them by default.  The fields
+#   of other columns are dropped as soon as each line is split.
+# where : conditions such as "year == 2008" or "hwy >= 30"; only rows meeting
+#   all of them are kept.
+# head : keep only the first head rows (meeting the conditions).
+# sample : keep a uniform sample of this many rows, drawn in one pass with
+#   the random seed seed, in file order.
 #---------------------------------------------------------------------------------
 
-def read(filename, sep=None, header=None, skip_header=0):
+def read(filename, sep=None, header=None, skip_header=0, cached=False, jobs=None, columns=None,
+      where=None, head=None, sample=None, seed=0):
+   with stage('read') as info:
+      data = _read(filename, sep, header, skip_header, cached, jobs, columns, where, head, sample, seed)
+      info.update(rows=data.nrow, columns=data.ncol)
+   return data
+
+def _read(filename, sep, header, skip_header, cached, jobs, columns, where, head, sample, seed):
+   options = (sep, header, skip_header)
+   if where or head is not None or sample is not None:
+      options += (where, head, sample, seed)
+   if columns is not None:
+      columns = unique(columns)
+   if cached:
+      with stage('read.cache.load'):
+         entry = cache.load(filename, options, columns)
+      if entry is not None:
+         names, values, levels, types, subset = entry
+         data = Data(names, columns=values, levels=levels)
+         for name in names:
+            data[name]._type = types[name]
+         data.subset = subset
+         return data
+
+   if jobs is None:
+      import multiprocessing
+      jobs = multiprocessing.cpu_count() if os.path.getsize(filename) >= PARALLEL_SIZE else 1
+   if head is not None or sample is not None:   # these need the rows in order
+      jobs = 1
+   parsed = read_parallel(filename, sep, header, skip_header, jobs, columns, where) if jobs > 1 else None
+   total = None
+   if parsed is not None:
+      header, names, values = parsed
+      data = Data(names, columns=values)
+   else:
+      with stage('read.split'):
+         rows = iter_rows(filename, sep, skip_header)
+         header = header or next(rows)
+         if where:
+            rows = filter_rows(header, rows, where)
+         if head is not None:
+            rows = itertools.islice(rows, head)
+         if sample is not None:
+            rows, total = reservoir(rows, sample, seed)
+         names, rows = select_columns(header, rows, columns)
+         rows = list(rows)
+      with stage('read.parse') as info:
+         info.update(rows=len(rows))
+         data = Data(names, rows)
+
+   data.subset = describe_subset(data.nrow, where, head, total)
+   if cached:
+      with stage('read.cache.save'):
+         names = list(data.keys())
+         values = [ data[k].codes if data[k].type == 0 else data[k].values for k in names ]
+         levels = { k : data[k].levels for k in names if data[k].type == 0 }
+         types = { k : data[k].type for k in names }
+         cache.save(filename, options, [ clean_string(s) for s in header ], names, values, levels, types, data.subset)
+   return data
+
+def unique(names):
+   seen = set()
+   return [ n for n in names if not (n in seen or seen.add(n)) ]
+
+#-----------------------------------------------------------------------------
+# Description of the rows read, shown on plots, or None if all were read.
+# total : number of rows a sample of nrow rows was drawn from.
+#-----------------------------------------------------------------------------
+
+def describe_subset(nrow, where=None, head=None, total=None):
+   notes = []
+   if where:
+      notes.append('where %s' % ' and '.join(where))
+   if head is not None:
+      notes.append('first %d rows' % nrow)
+   if total is not None and nrow < total:
+      notes.append('sample of %d of %d rows (%.3g%%)' % (nrow, total, 100.0 * nrow / total))
+   return ', '.join(notes) or None
+
+#-----------------------------------------------------------------------------
+# Keep the rows meeting every condition of where, given as "column op value"
+# with op one of == (or =), !=, <, <=, >, >=.  Fields are cleaned as in
+# clean_string; they are compared as numbers if the value is a number, and
+# as strings otherwise.  Rows are checked to have as many fields as the header.
+#-----------------------------------------------------------------------------
+
+OPERATORS = { '==' : operator.eq, '=' : operator.eq, '!=' : operator.ne,
+   '<' : operator.lt, '<=' : operator.le, '>' : operator.gt, '>=' : operator.ge }
+
+def parse_condition(condition):
+   m = re.match(r'^\s*(.+?)\s*(==|!=|<=|>=|=|<|>)\s*(.*?)\s*$', condition)
+   if m is None:
+      raise Exception("Cannot understand condition: %s" % condition)
+   return m.group(1), m.group(2), convert(clean_string(m.group(3)))
+
+def filter_rows(header, rows, where):
+   names = [ clean_string(s) for s in header ]
+   tests = []
+   for column, op, value in (parse_condition(c) for c in where):
+      if column not in names:
+         raise Exception("Unknown column: %s" % column)
+      tests.append((names.index(column), OPERATORS[op], value))
+
+   def match(s, op, value):
+      s = clean_string(s)
+      if not isinstance(value, str):
+         try:
+            s = float(s)
+         except ValueError:
+            return False
+      return op(s, value)
+
+   for row in rows:
+      check_fields(names, row)
+      if all(match(row[i], op, value) for i, op, value in tests):
+         yield row
+
+#-----------------------------------------------------------------------------
+# Uniform sample of n rows, in their order, and the number of rows, from one
+# pass over rows.  Reservoir sampling with geometric skips (Li's algorithm L)
+# draws random numbers only for the rows that enter the sample.
+#-----------------------------------------------------------------------------
+
+def reservoir(rows, n, seed=0):
+   random = np.random.RandomState(seed)
+   def uniform():
+      return 1.0 - random.random_sample()   # in (0, 1]
+
+   count = [0]
+   def numbered(rows):
+      for row in rows:
+         count[0] += 1
+         yield count[0], row
+   rows = numbered(rows)
+
+   sample = list(itertools.islice(rows, n))
+   if len(sample) == n and n > 0:
+      w = math.exp(math.log(uniform()) / n)
+      while True:
+         skip = int(math.log(uniform()) / math.log(1 - w)) if w < 1 else 0
+         row = next(itertools.islice(rows, skip, None), None)
+         if row is None:
+            break
+         sample[random.randint(n)] = row
+         w *= math.exp(math.log(uniform()) / n)
+   sample.sort(key=lambda r: r[0])
+   return [ r for i, r in sample ], count[0]
+
+#-----------------------------------------------------------------------------
+# Read a delimited file in chunks of rows and return a compact Data holding,
+# for each combination of keys, the number of rows and the sum of the values.
+#
+# keys : columns rows are grouped by.
+# values : columns that are summed.  Categorical ones are grouped by instead.
+# bins : dictionary of column name -> number of equal-width bins.  These
+#   columns are grouped by bin, which takes an extra pass over the file to find
+#   their range.
+# sketch_error : if given, a quantile sketch of the values of each group is
+#   kept, with about this rank error, so that quartiles can be plotted.
+# where, head : as in read.
+#-----------------------------------------------------------------------------
+
+CHUNKSIZE = 100000
+
+def stream(filename, keys=(), values=(), bins=None, sketch_error=None, sep=None, header=None, skip_header=0, chunksize=CHUNKSIZE,
+      where=None, head=None):
+   with stage('stream') as info:
+      edges = {}
+      if bins:
+         with stage('stream.ranges'):
+            ranges = Summary(values=bins.keys())
+            for names, columns in iter_chunks(filename, sep, header, skip_header, chunksize, unique(bins.keys()), where, head):
+               ranges.update(dict(zip(names, columns)))
+            edges = { k : np.linspace(ranges.ranges[k][0], ranges.ranges[k][1], n+1) for k,n in bins.items() }
+
+      with stage('stream.summarize'):
+         summary = Summary(keys, values, edges, sketch_error)
+         for names, columns in iter_chunks(filename, sep, header, skip_header, chunksize, unique(list(keys) + list(values)), where, head):
+            summary.update(dict(zip(names, columns)))
+
+      names, columns, counts, sketches = summary.table()
+      data = Data(names, columns=columns)
+      data.weights = counts
+      data.ranges = summary.ranges
+      data.bins = edges
+      data.sketches = sketches
+      data.subset = describe_subset(summary.nrow, where, head)
+      info.update(rows=summary.nrow, groups=data.nrow)
+   return data
+
+#-----------------------------------------------------------------------------
+
+def iter_chunks(filename, sep=None, header=None, skip_header=0, chunksize=CHUNKSIZE, columns=None, where=None, head=None):
+   rows = iter_rows(filename, sep, skip_header)
+   header = header or next(rows)
+   if where:
+      rows = filter_rows(header, rows, where)
+   if head is not None:
+      rows = itertools.islice(rows, head)
+   column_names, rows = select_columns(header, rows, columns)
+   column_names = [ clean_string(s) for s in column_names ]
+   while True:
+      lines = list(itertools.islice(rows, chunksize))
+      if not lines:
+         break
+      yield column_names, parse_lines(column_names, lines)
+
+def separator(filename, sep=None):
    if sep is None:
+      filename = compressed.inner_name(filename)
       if filename[-4:] == '.csv':
          sep = ','
       elif filename[-4:] == '.tsv':
          sep = '\t'
       else:
          raise Exception("Unknown file type.  Please specify separator.")
+   return sep
 
-   with open(filename, 'rU') as f:
+def iter_rows(filename, sep=None, skip_header=0):
+   sep = separator(filename, sep)
+   with compressed.open_file(filename, 'rU') as f:
       reader = csv.reader(f, delimiter=sep)
-      rows = []
       for row in reader:
          if skip_header > 0:
             skip_header -= 1
          elif row and row[0][0] != '#':
-            rows.append(row)
+            yield row
+
+#-----------------------------------------------------------------------------
+# Return the header fields of the named columns, and the rows with only their
+# fields.  Rows are checked to have as many fields as the header first.
+# columns of None selects every column and leaves rows alone.
+#-----------------------------------------------------------------------------
+
+def select_columns(header, rows, columns=None):
+   if columns is None:
+      return header, rows
+   names = [ clean_string(s) for s in header ]
+   for c in columns:
+      if c not in names:
+         raise Exception("Unknown column: %s" % c)
+   indices = [ names.index(c) for c in columns ]
+   def select():
+      for row in rows:
+         check_fields(names, row)
+         yield [ row[i] for i in indices ]
+   return [ header[i] for i in indices ], select()
+
+def check_fields(column_names, line):
+   if len(column_names) != len(line):
+      values = [ clean_string(s) for s in line ]
+      raise Exception("Inequal number of keys and values:\n%s\n%s\n" % (column_names, values))
+
+#-----------------------------------------------------------------------------
+# Turn rows of strings into one array of parsed values per column.
+
+# raw : indices of columns returned as cleaned strings, without conversion.
+#-----------------------------------------------------------------------------
+
+def parse_lines(column_names, lines, raw=()):
+   for line in lines:
+      check_fields(column_names, line)
+
+   columns = list(zip(*lines)) or [ () for name in column_names ]
+   return [ clean_column(c) if i in raw else parse_column(c) for i, c in enumerate(columns) ]
+
+#-----------------------------------------------------------------------------
+# Read a file with several processes and return its header, the names and
+# the values of the selected columns, or None if the file cannot be split.  The rows before the first data row
+# (skipped, comment and header rows) are read here.  The rest of the file is
+# split into one byte range per process, at line ends outside quoted fields.
+# Each process parses its range into columns, and the columns of all ranges
+# are joined in file order with the type that parse_column gives the whole
+# column.
+#-----------------------------------------------------------------------------
+
+PARALLEL_SIZE = 1 << 24   # files from this size on are read in parallel by default
+
+def read_parallel(filename, sep=None, header=None, skip_header=0, jobs=None, columns=None, where=None):
+   import multiprocessing
+   sep = separator(filename, sep)
+   if compressed.compression(filename):   # byte ranges of compressed files cannot be read on their own
+      return None
+   with open(filename, 'rb') as f:
+      head = f.read(1 << 16)
+   if '\r' in head and '\n' not in head:   # old Mac line ends, which only the sequential reader handles
+      return None
+   start, first = data_offset(filename, sep, header, skip_header)
+   header = header or first
+   if header is None:
+      return None
+   names = select_columns(header, (), columns)[0]
+
+   pool = multiprocessing.Pool(jobs)
+   try:
+      with stage('read.split'):
+         bounds = line_bounds(filename, start, os.path.getsize(filename), jobs)
+         quotes = pool.map(count_quotes, [ (filename, a, b) for a, b in zip(bounds[:-1], bounds[1:]) ])
+         # a range may only end where an even number of quotes came before
+         bounds = [ bounds[0] ] + [ b for b, q in zip(bounds[1:-1], np.cumsum(quotes)) if q % 2 == 0 ] + [ bounds[-1] ]
+         ranges = list(zip(bounds[:-1], bounds[1:]))
+
+      with stage('read.parse', jobs=jobs) as info:
+         chunks = pool.map(parse_range, [ (filename, sep, header, columns, where, a, b, ()) for a, b in ranges ])
+         values = []
+         for i, parts in enumerate(zip(*chunks)):
+            kinds = set(p.dtype.kind for p in parts if len(p))
+            if kinds <= set('i'):
+               values.append(np.concatenate(parts).astype(np.int64))
+            elif kinds <= set('if'):
+               values.append(np.concatenate(parts).astype(np.float64))
+            else:
+               values.append(None)
+
+         # columns with text in some ranges and numbers in others are text;
+         # their numbers are parsed again as strings
+         raw = set(i for i, c in enumerate(values) if c is None)
+         if raw:
+            redo = [ k for k, chunk in enumerate(chunks) if any(chunk[i].dtype.kind in 'if' and len(chunk[i]) for i in raw) ]
+            for k, chunk in zip(redo, pool.map(parse_range, [ (filename, sep, header, columns, where, ranges[k][0], ranges[k][1], raw) for k in redo ])):
+               chunks[k] = chunk
+            for i in raw:
+               values[i] = np.concatenate([ chunk[i] for chunk in chunks if len(chunk[i]) ] or [ chunks[0][i] ])
+         info.update(rows=len(values[0]) if values else 0)
+   finally:
+      pool.close()
+      pool.join()
+   return header, names, values
+
+#-----------------------------------------------------------------------------
+# Byte offset of the first data row of a file, and its header row if header
+# is None (None if the file has no header row).
+#-----------------------------------------------------------------------------
+
+def data_offset(filename, sep, header=None, skip_header=0):
+   with open(filename, 'rb') as f:
+      offset = [0]
+      def lines():
+         for line in iter(f.readline, ''):
+            offset[0] += len(line)
+            yield line
+      reader = csv.reader(lines(), delimiter=sep)
+      while True:
+         start = offset[0]
+         try:
+            row = next(reader)
+         except StopIteration:
+            return offset[0], None
+         if skip_header > 0:
+            skip_header -= 1
+         elif row and row[0][0] != '#':
+            if header is None:
+               return offset[0], row
+            return start, None
+
+#-----------------------------------------------------------------------------
+# Split the bytes from start to end of a file into about n ranges that end at
+# line ends.
+#-----------------------------------------------------------------------------
+
+def line_bounds(filename, start, end, n):
+   bounds = [ start ]
+   with open(filename, 'rb') as f:
+      for i in range(1, n):
+         f.seek(max(start + (end - start) * i // n - 1, bounds[-1]))
+         f.readline()
+         if bounds[-1] < f.tell() < end:
+            bounds.append(f.tell())
+   bounds.append(end)
+   return bounds
+
+def read_range(filename, start, end):
+   with open(filename, 'rb') as f:
+      f.seek(start)
+      return f.read(end - start)
+
+def count_quotes(args):
+   return read_range(*args).count('"')
+
+#-----------------------------------------------------------------------------
+# Parse the rows in a byte range of a file, as iter_rows, filter_rows and
+# parse_lines do.
+#-----------------------------------------------------------------------------
 
-   return Data(header or rows.pop(0), rows)
+def parse_range(args):
+   filename, sep, header, columns, where, start, end, raw = args
+   return parse_text(read_range(filename, start, end), sep, header, columns, where, raw)[1]
+
+# names of the selected columns and their values in the rows of text
+def parse_text(text, sep, header, columns=None, where=None, raw=()):
+   if '\r' in text:
+      text = text.replace('\r\n', '\n').replace('\r', '\n')
+   rows = ( row for row in csv.reader(text.splitlines(True), delimiter=sep) if row and row[0][0] != '#' )
+   if where:
+      rows = filter_rows(header, rows, where)
+   names, rows = select_columns(header, rows, columns)
+   names = [ clean_string(s) for s in names ]
+   return names, parse_lines(names, list(rows), raw)
+
+#-----------------------------------------------------------------------------
+# Read a delimited file that keeps growing, such as the output of a running
+# job.  read() returns a Data with the rows written so far; update() parses
+# only the lines appended since, up to the last complete line, adds them to
+# the same Data and returns their number.
+#
+# columns, where : as in read.
+#-----------------------------------------------------------------------------
+
+class Tail(object):
+   def __init__(self, filename, sep=None, header=None, skip_header=0, columns=None, where=None):
+      if compressed.compression(filename):
+         raise Exception("Cannot follow a compressed file: %s" % filename)
+      self.filename = filename
+      self.sep = separator(filename, sep)
+      self.columns = unique(columns) if columns is not None else None
+      self.where = where
+      self.offset, first = data_offset(filename, self.sep, header, skip_header)
+      self.header = header or first
+      if self.header is None:
+         raise Exception("No header in %s." % filename)
+      self.data = None
+
+   def read(self):
+      with stage('read') as info:
+         names, columns = self.parse(self.lines())
+         self.data = Data(names, columns=columns)
+         self.data.subset = describe_subset(self.data.nrow, self.where)
+         info.update(rows=self.data.nrow, columns=self.data.ncol)
+      return self.data
+
+   def update(self):
+      if os.path.getsize(self.filename) < self.offset:
+         raise Exception("%s was truncated while it was followed." % self.filename)
+      with stage('read.follow') as info:
+         text = self.lines()
+         n = 0
+         if text:
+            names, columns = self.parse(text)
+            n = len(columns[0]) if columns else 0
+            if n:
+               self.data.append(dict(zip(names, columns)))
+         info.update(rows=n)
+      return n
+
+   # the complete lines from offset on; offset is moved past them
+   def lines(self):
+      with open(self.filename, 'rb') as f:
+         f.seek(self.offset)
+         text = f.read()
+      text = text[:text.rfind('\n') + 1]
+      self.offset += len(text)
+      return text
+
+   def parse(self, text):
+      return parse_text(text, self.sep, self.header, self.columns, self.where)
 
 #-----------------------------------------------------------------------------
 class Row(dict):
    def __init__(self):
       pass
 
+#-----------------------------------------------------------------------------
+# Lazy view of the rows of a Data instance.  Values are stored by column, so
+# a Row is only assembled when it is accessed.
+#-----------------------------------------------------------------------------
+
+class Rows(object):
+   def __init__(self, data):
+      self.data = data
+
+   def __len__(self):
+      return self.data.nrow
+
+   def __getitem__(self, i):
+      if i < 0:
+         i += len(self)
+      if not 0 <= i < len(self):
+         raise IndexError('row index out of range')
+      row = Row()
+      for name, c in self.data.items():
+         row[name] = c[i]
+      return row
+
+   def __iter__(self):
+      for i in range(len(self)):
+         yield self[i]
+
 #-----------------------------------------------------------------------------
 #  0 - categorical (type str)
 #  1 - discrete quantitative  (type int)
 #  2 - continuous quantitative (type float)
+#
+#  Values are kept in a typed numpy array: int64 for discrete columns, float64
+#  for continuous columns.  Categorical values are dictionary-encoded as integer
+#  codes into a sorted table of interned levels; codes are uint8 or uint16 for
+#  up to 256 or 65536 levels.  Grouping, colors and tick labels use the codes,
+#  and strings are only looked up for single rows.
 #-----------------------------------------------------------------------------
 
-class Column(list):
-   def __init__(self, name, data):
+class Column(object):
+   # values: array of values, or of codes into levels if levels is given
+   def __init__(self, name, data, values=(), levels=None):
       self.name = name
       self.label = name
+      self.transform = None   # function of an array of values, giving marker sizes as a size column
       self.data = data
+      self._stats = {}
+      self.assign(np.asarray(values), levels)
+
+   def assign(self, values, levels=None):
       self._type = 0   # default is type str, categorical
+      self._values = self._levels = self._codes = None
+      if levels is not None:
+         self._levels, self._codes = levels, values
+      elif values.dtype.kind in 'iu':
+         self._type = 1
+         self._values = values.astype(np.int64, copy=False)
+      elif values.dtype.kind == 'f':
+         self._type = 2
+         self._values = values.astype(np.float64, copy=False)
+      else:
+         self._levels, self._codes = factorize(values)
 
    @property
    def type(self):
@@ -74,13 +595,131 @@ class Column(list):
          raise Exception('Unknown column type')
       else:
          self._type = value
+      self._stats = {}
       self.data.xy = None   # this is a hack to force default assignment on xy
 
-   def init_type(self):
-      if all(isinstance(v, int) for v in self):
-         self._type = 1
-      elif all((isinstance(v,int) or isinstance(v,float)) for v in self):
-         self._type = 2
+   # numpy array of the values; categorical values are decoded from their codes
+   @property
+   def values(self):
+      if self._values is None:
+         return np.array(self._levels, dtype=object)[self._codes]
+      return self._values
+
+   # sorted distinct values of the column
+   @property
+   def levels(self):
+      if self._levels is None:
+         self._levels, self._codes = factorize(self._values)
+      return self._levels
+
+   # position of each value in levels
+   @property
+   def codes(self):
+      if self._codes is None:
+         self._levels, self._codes = factorize(self._values)
+      return self._codes
+
+   #--------------------------------------------------------------------------
+   # Statistics of the column, computed when first asked for and kept until
+   # its type is set.  Nulls are NaN in numeric columns and empty strings in
+   # categorical ones; counts are the number of rows of each level.
+   #--------------------------------------------------------------------------
+   def stat(self, name, compute):
+      if name not in self._stats:
+         self._stats[name] = compute()
+      return self._stats[name]
+
+   @property
+   def cardinality(self):
+      return self.stat('cardinality', lambda: len(self.levels))
+
+   @property
+   def min(self):
+      return self.stat('min', lambda: self._levels[0] if self._values is None else self._values.min())
+
+   @property
+   def max(self):
+      return self.stat('max', lambda: self._levels[-1] if self._values is None else self._values.max())
+
+   @property
+   def nulls(self):
+      def count():
+         if self._values is None:
+            return int(self.counts[self._levels.index('')]) if '' in self._levels else 0
+         return int(np.isnan(self._values).sum()) if self._values.dtype.kind == 'f' else 0
+      return self.stat('nulls', count)
+
+   @property
+   def counts(self):
+      return self.stat('counts', lambda: np.bincount(self.codes, minlength=len(self.levels)))
+
+   #--------------------------------------------------------------------------
+   # Append parsed values.  A column without rows takes the type of the new
+   # values.  Discrete columns become continuous when floats are appended,
+   # and numbers appended to categorical columns are kept as strings.  The
+   # minimum, maximum and counts kept in the statistics are updated from the
+   # new values alone; new levels are merged into the sorted levels.
+   #--------------------------------------------------------------------------
+   def extend(self, values):
+      values = np.asarray(values)
+      if not len(values):
+         return
+      stats, self._stats = self._stats, {}
+      if not len(self):
+         self.assign(values)
+      elif self._values is not None:
+         if values.dtype.kind not in 'iuf':
+            raise Exception("Column %s is not quantitative after row %d." % (self.name, len(self)))
+         if values.dtype.kind == 'f' and self._values.dtype.kind != 'f':
+            self._values = self._values.astype(np.float64)
+            if self._type == 1:
+               self._type = 2
+         self._values = np.concatenate((self._values, values.astype(self._values.dtype, copy=False)))
+         self._levels = self._codes = None
+         for name, f in (('min', np.minimum), ('max', np.maximum)):
+            if name in stats:
+               self._stats[name] = f(stats[name], getattr(values, name)())
+      else:
+         if values.dtype.kind not in 'SUO':
+            values = values.astype(str)
+         levels, codes = factorize(values)
+         merged = sorted(set(self._levels).union(levels))
+         position = { v : i for i, v in enumerate(merged) }
+         if merged != self._levels:
+            remap = np.array([ position[v] for v in self._levels ], dtype=np.intp)
+            self._codes = remap[self._codes]
+            if 'counts' in stats:
+               counts = np.zeros(len(merged), dtype=stats['counts'].dtype)
+               counts[remap] = stats['counts']
+               stats['counts'] = counts
+         codes = np.array([ position[v] for v in levels ], dtype=np.intp)[codes]
+         self._codes = np.concatenate((self._codes, codes)).astype(code_dtype(len(merged)), copy=False)
+         self._levels = merged
+         if 'counts' in stats:
+            self._stats['counts'] = stats['counts'] + np.bincount(codes, minlength=len(merged))
+
+   # bytes held by the values, codes and levels of the column
+   @property
+   def nbytes(self):
+      n = sum(a.nbytes for a in (self._values, self._codes) if a is not None)
+      if self._levels is not None:
+         n += sum(sys.getsizeof(v) for v in self._levels)
+      return n
+
+   def __len__(self):
+      return len(self._codes if self._values is None else self._values)
+
+   def __iter__(self):
+      if self._values is None:
+         levels = self._levels
+         return (levels[c] for c in self._codes)
+      return iter(self._values.tolist())
+
+   def __getitem__(self, i):
+      if self._values is None and np.ndim(i) == 0:
+         return self._levels[self._codes[i]]
+      v = self.values[i]
+      return v.item() if isinstance(v, np.generic) else v
 
 
 #-----------------------------------------------------------------------------
@@ -102,21 +741,26 @@ def cq_type(col1, col2):
    return col1.type * col2.type == 0
 
 
+#-----------------------------------------------------------------------------
+# column of a plot setting (x, y, group, ...), kept in each Data
 #-----------------------------------------------------------------------------
 
 class ColumnProp(object):
    def __init__(self, name):
       self.name = name
-      self.v = None
 
    def __get__(self, instance, owner):
-      return self.v
+      if instance is None:
+         return self
+      return instance.__dict__.get(self.name)
 
    def __set__(self, instance, value):
-      self.v = instance[value] if value is not None else None
+      instance.__dict__[self.name] = instance[value] if value is not None else None
 
 #-----------------------------------------------------------------------------
 
+MEMO_SIZE = 8
+
 #
 # iterate through rows, keyed by columns
 #
@@ -128,35 +772,68 @@ class Data(dict):
    group = ColumnProp('group')
    size = ColumnProp('size')
 
-   def __init__(self, header, lines):
+   def __init__(self, header, lines=(), columns=None, levels=None):
       self._xy = None
       self.styles = { 'bar_spacing' : 0.2 }
       self._cur_index_ = -1
+      self.weights = None   # number of rows each row stands for, in summarized data
+      self.ranges = {}      # column name -> (min, max) of summarized values
+      self.bins = {}        # column name -> bin edges of binned columns
+      self.sketches = {}    # column name -> quantile sketch of each summarized row
+      self.subset = None    # description of the rows read, if not all of them
+      self._memo = collections.OrderedDict()
+      self._figure = None   # (figure, axes) of the last plot, with styles['reuse_figure']
       column_names = [ clean_string(s) for s in header ]
 
-      for name in column_names:
-         self[name] = Column(name, self)
-      self._rows_ = []
-
-
-      for line in lines:
-         values = [ clean_string(s) for s in line ]
+      if columns is None:
+         columns = parse_lines(column_names, lines)
+      levels = levels or {}
+      for i, name in enumerate(column_names):
+         self[name] = Column(name, self, columns[i], levels.get(name))
+      self._rows_ = Rows(self)
 
-         if len(column_names) != len(values):
-            raise Exception("Inequal number of keys and values:\n%s\n%s\n" % (column_names, values))
-
-         row = Row()
-         for i,v in enumerate(values):
-            name = column_names[i]
-            row[name] = convert(v)
-            self[name].append(row[name])
-         self._rows_.append(row)
+      self.nrow = len(columns[0]) if columns else 0
+      self.ncol = len(self.keys())
 
-      for name in column_names:
-         self[name].init_type()
+   def __setitem__(self, name, column):
+      super(Data, self).__setitem__(name, column)
+      self._memo.clear()
+
+   #--------------------------------------------------------------------------
+   # Results computed from the columns, such as row groupings and aggregates,
+   # kept for the next plots under a key describing them.  Only the last
+   # MEMO_SIZE results are kept; replacing a column drops them all.
+   #--------------------------------------------------------------------------
+   def memo(self, key, compute):
+      if key in self._memo:
+         value = self._memo.pop(key)
+      else:
+         value = compute()
+      self._memo[key] = value
+      while len(self._memo) > MEMO_SIZE:
+         self._memo.popitem(last=False)
+      return value
+
+   # drop the results kept by memo and the figure kept for reuse, so that the
+   # next plot computes and draws everything again
+   def clear_memo(self):
+      self._memo.clear()
+      self._figure = None
+
+   #--------------------------------------------------------------------------
+   # Add rows, given as a dictionary of column name -> array of parsed values
+   # with an entry for every column.  Results kept by memo are dropped.
+   #--------------------------------------------------------------------------
+   def append(self, columns):
+      n = len(next(iter(columns.values()))) if columns else 0
+      for name, c in self.items():
+         c.extend(columns[name])
+      self.nrow += n
+      self._memo.clear()
 
-      self.nrow = len(self._rows_)
-      self.ncol = len(self.keys())
+   @property
+   def nbytes(self):
+      return sum(c.nbytes for c in self.values())
 
    # Iterate through rows
    def __iter__(self):
@@ -182,7 +859,7 @@ class Data(dict):
       if self.x is not None and self.y is not None:
          if qq_type(self.x, self.y):
             self._xy = value or 'discrete'
-            if self.xy not in ('discrete', 'sequential', 'distribution'):
+            if self.xy not in ('discrete', 'sequential', 'distribution', 'density'):
                raise Exception("Unknown xy type: " + self.xy)
          elif cq_type(self.x, self.y):
             self._xy = value or 'sum'
@@ -202,49 +879,43 @@ class Data(dict):
       self.size = size
       self.xy = xy
 
-   def plot(self):
+   # plot settings and the types of the columns they refer to
+   def settings(self):
+      columns = dict(x=self.x, y=self.y, xx=self.xx, yy=self.yy, group=self.group, size=self.size)
+      settings = { k : c.name if c is not None else None for k,c in columns.items() }
+      settings['xy'] = self.xy
+      settings['types'] = { c.name : c.type for c in columns.values() if c is not None }
+      return settings
+
+   def restore(self, settings):
+      self.set(**{ k : v for k,v in settings.items() if k not in ('xy', 'types') })
+      for name, t in settings['types'].items():
+         self[name].type = t
+      self.xy = settings['xy']
+
+   # show the plot, or save it to filename
+   def plot(self, filename=None):
       if self.x is None and self.y is None:
          return
       if self.x is None or self.y is None or cq_type(self.x, self.y):
          p = CQPlot(self)
          self.styles['legend_marker'] = 's'
       elif qq_type(self.x, self.y):
+         if self.weights is not None and self.xy != 'density':
+            raise Exception("Summarized data can only be drawn as a density plot.")
          p = QQPlot(self)
          self.styles['legend_marker'] = 'o'
       else:
          raise Exception("Not Implemented")
-      p.plot()
+      p.plot(filename)
 
 #-----------------------------------------------------------------------------
-# rows : a list of Row instances
-# key : a Column instance
+# key of a Column in a GroupBy
 #-----------------------------------------------------------------------------
-def split_rows_by_col(rows, c):
+def group_key(c):
    if c is None:
-      return 1, { None : rows }
-   result = { k : [] for k in c }
-   for r in rows:
-      result[r[c.name]].append(r)
-   return len(result), result
-
-
-#-----------------------------------------------------------------------------
-# rows : a list of Row instances
-# xx, yy: Column instances
-#-----------------------------------------------------------------------------
-def split_rows_by_2cols(rows, c1, c2):
-   if c1 is None and c2 is None:
-      return 1, 1, { ('','') : rows }
-
-   set1 = set(c1 if c1 is not None else [''])
-   set2 = set(c2 if c2 is not None else [''])
-
-   result = { (k2,k1): [] for k1 in set1 for k2 in set2 }
-   for row in rows:
-      k1 = row[c1.name] if c1 is not None else ''
-      k2 = row[c2.name] if c2 is not None else ''
-      result[(k2,k1)].append(row)
-   return len(set2), len(set1), result
+      return None
+   return c.codes, len(c.levels)
 
 #-----------------------------------------------------------------------------
 
@@ -253,6 +924,8 @@ class Plot(object):
       self.data = data
       self.figure = None
       self.markers_and_labels = None
+      self.tiled = False
+      self.bbox = None   # of the facets in the figure of a tiled plot
 
    def get_sequential_colors(self):
       # Linearly interpolate alpha between alpha_min and alpha_max based on quantitative labels
@@ -267,7 +940,7 @@ class Plot(object):
    def prepare_legend(self):
       self.legend_colorbar = False
       if self.data.group is not None:
-         self.legend_labels = sorted(set(self.data[self.data.group.name]))
+         self.legend_labels = self.data.group.levels
 
          # set color theme
          if self.data.group.type > 0 and qq_type(self.data.x, self.data.y):
@@ -275,7 +948,7 @@ class Plot(object):
                colors = self.get_sequential_colors()
             else:
                self.legend_colorbar = True
-               self.vmin, self.vmax = min(self.data.group), max(self.data.group)
+               self.vmin, self.vmax = self.data.group.min, self.data.group.max
          else:
             if len(self.legend_labels) > 9:
                raise Exception("Too many colors: %d" % len(self.legend_labels))
@@ -303,6 +976,8 @@ class Plot(object):
 
 
    def set_legend(self):
+      if self.data.group is None:
+         return
       if not self.legend_colorbar:
          if self.data.styles.get('legend_position', None) == 'right':
             self.data.styles.setdefault('legend_cols', 1)
@@ -327,21 +1002,27 @@ class Plot(object):
 
 
    def update_plot_options(self, groups, options):
-      for k, group in groups.items():
+      for k, cell in groups.items():
+         group = self.groupby.indices(cell)
          if self.data.size is not None:
-            if isinstance(self.data.size, int) or isinstance(self.data.size, float):
-               options[k].update(s = self.data.size)
-            else:
-               t = self.data.size.transform
-               options[k].update(s = [r[self.data.size.name] if t is None else t(r[self.data.size.name]) for r in group])
+            options[k].update(s = self.marker_sizes(group))
 
          if self.legend_colorbar:
-            c = [r[self.data.group.name] for r in group]
-            if c:
+            c = self.data.group.values[group]
+            if len(c):
                options[k].update(cmap=cm.copper, c=c, vmin=self.vmin, vmax=self.vmax)
          else:
             options[k].update(color = self.color_map[k])
 
+   # sizes of the markers of rows: the size, or the values of the size column
+   # with its transform applied to all of them at once
+   def marker_sizes(self, rows):
+      if isinstance(self.data.size, int) or isinstance(self.data.size, float):
+         return self.data.size
+      t = self.data.size.transform
+      s = self.data.size.values[rows]
+      return s if t is None else t(s)
+
    def set_labels(self):
       if self.data.x is not None:
          xlabel = self.data.x.label
@@ -352,89 +1033,517 @@ class Plot(object):
       else:
          ylabel = 'density' if self.data.styles.get('normed',None) else 'count'
 
-      xmin = min( self.axarr[k/self.n, k%self.n].get_position().xmin for k in range(len(self.rows.keys())) )
-      xmax = max( self.axarr[k/self.n, k%self.n].get_position().xmax for k in range(len(self.rows.keys())) )
-      ymin = min( self.axarr[k/self.n, k%self.n].get_position().ymin for k in range(len(self.rows.keys())) )
-      ymax = max( self.axarr[k/self.n, k%self.n].get_position().ymax for k in range(len(self.rows.keys())) )
+      bbox = self.panels_bbox()
+      xmin, xmax, ymin, ymax = bbox.xmin, bbox.xmax, bbox.ymin, bbox.ymax
 
       self.figure.text(xmin+(xmax-xmin)*0.5, ymin-0.05, xlabel, ha='center', va='top')
       self.figure.text(0.05, ymin+(ymax-ymin)*0.5, ylabel, ha='left', va='center', rotation='vertical')
 
+      # rows plotted, if not the whole file
+      if self.data.subset:
+         self.figure.text(0.99, 0.01, self.data.subset, ha='right', va='bottom', fontsize='small', color='gray')
 
-   def plot(self):
+   def plot(self, filename=None):
+      data = self.data
+      xx_levels = data.xx.levels if data.xx is not None else ['']
+      yy_levels = data.yy.levels if data.yy is not None else ['']
+      self.group_levels = data.group.levels if data.group is not None else [None]
+      self.m, self.n = len(yy_levels), len(xx_levels)
+      self.grid = [ (k2,k1) for k2 in yy_levels for k1 in xx_levels ]
+      self.facets = range(len(self.grid))
+      self.tiled = filename is not None and len(self.grid) >= data.styles.get('tile_facets', TILE_FACETS)
+      with stage('plot', kind=data.xy, rows=data.nrow, groups=len(self.group_levels), facets=len(self.grid)):
+         if self.tiled:
+            load_matplotlib()
+         else:
+            with stage('plot.subplots', facets=len(self.grid)):
+               self.subplots()
+         with stage('plot.prepare_legend', groups=len(self.group_levels)):
+            self.prepare_legend()
+         with stage('plot.precompute', rows=data.nrow):
+            self.precompute()
+         with stage('plot.groupby', rows=data.nrow) as info:
+            keys = [ data.yy, data.xx, data.group ] + self.group_columns()
+            self.groupby = data.memo(('groupby',) + tuple(c and c.name for c in keys),
+               lambda: GroupBy([ group_key(c) for c in keys ], data.nrow, data.weights))
+            info.update(groups=self.groupby.size)
+         with stage('plot.aggregate', rows=data.nrow):
+            settings = data.settings()
+            key = ('aggregate', type(self).__name__, self.legend_colorbar, tuple(sorted(settings.pop('types').items())),
+               tuple(sorted(settings.items()))) + tuple(data.styles.get(k) for k in ('density_bins', 'max_points', 'sketch_error', 'bars', 'error_bars'))
+            def aggregate():
+               self.aggregate()
+               return { k : getattr(self, k) for k in self.aggregates if hasattr(self, k) }
+            self.__dict__.update(data.memo(key, aggregate))
+         if self.tiled:
+            with stage('plot.tiles', facets=len(self.grid)):
+               self.plot_tiles(filename)
+            return
+
+         self.plot_facets(self.facets)
+         with stage('plot.postcompute'):
+            self.postcompute()
+         with stage('plot.set_legend', groups=len(self.group_levels)):
+            self.set_legend()
+         with stage('plot.set_labels', facets=len(self.grid)):
+            self.set_labels()
+         if filename is not None:
+            with stage('plot.save'):
+               self.figure.savefig(filename)
+               if not data.styles.get('reuse_figure'):
+                  plt.close(self.figure)
+      if filename is None:
+         plt.show()
+
+   # draw the facets numbered k in facets, with their headers
+   def plot_facets(self, facets):
       data = self.data
-      self.m, self.n, self.rows = split_rows_by_2cols(data._rows_, data.xx, data.yy)
-      self.figure, self.axarr = plt.subplots(self.m, self.n, sharex=True, sharey=True, squeeze=False)
-      self.prepare_legend()
-      self.precompute()
-      for k, grid_id in enumerate(sorted(self.rows.keys())):
+      facet_rows = self.groupby.rows.reshape(self.m, self.n, -1).sum(axis=2)
+      for k in facets:
+         grid_id = self.grid[k]
          idx = (k/self.n, k%self.n)
          self.figure.subplots_adjust(hspace=0, wspace=0)
          self.axarr[idx].tick_params(top='off', right='off')
          if data.xx is not None and k<self.n:
-            label_spacing = 1.01+0.015*(0.9-0.1)/(self.axarr[idx].get_position().ymax-self.axarr[idx].get_position().ymin)
+            label_spacing = 1.01+0.015*(0.9-0.1)/(self.position(idx).ymax-self.position(idx).ymin)
             xx_label = '%s = %s'%(data.xx.label,grid_id[1]) if data.xx.label else grid_id[1]
             self.axarr[idx].text(0.5, label_spacing, xx_label, ha='center', va='bottom', rotation=0, transform=self.axarr[idx].transAxes)
          if data.yy is not None and (k+1)%self.n==0:
-            label_spacing = 1.01+0.015*(0.9-0.125)/ (self.axarr[idx].get_position().xmax-self.axarr[idx].get_position().xmin)
+            label_spacing = 1.01+0.015*(0.9-0.125)/ (self.position(idx).xmax-self.position(idx).xmin)
             yy_label = '%s = %s'%(data.yy.label,grid_id[0]) if data.yy.label else grid_id[0]
             self.axarr[idx].text(label_spacing, 0.5, yy_label, ha='left', va='center', rotation=270, transform=self.axarr[idx].transAxes)
 
-         _, groups = split_rows_by_col(self.rows[grid_id], data.group)
-         options =  { k : dict(alpha=self.data.styles.get('alpha', None)) for k in groups }
-         self.update_plot_options(groups, options)
-         self.plot_groups(idx, groups, options)
-
+         groups = { key : idx + (g,) for g, key in enumerate(self.group_levels) }
+         with stage('plot.plot_groups', facet=k, rows=int(facet_rows[idx]), groups=len(groups)):
+            options =  { k : dict(alpha=self.data.styles.get('alpha', None)) for k in groups }
+            self.update_plot_options(groups, options)
+            self.plot_groups(idx, groups, options)
+
+   # position of the axes of a facet in the figure
+   def position(self, idx):
+      if not self.tiled:
+         return self.axarr[idx].get_position()
+      from matplotlib.transforms import Bbox
+      w, h = self.bbox.width / self.n, self.bbox.height / self.m
+      return Bbox.from_bounds(self.bbox.x0 + idx[1] * w, self.bbox.y1 - (idx[0] + 1) * h, w, h)
+
+   # bounding box of the axes of all facets in the figure
+   def panels_bbox(self):
+      if self.tiled:
+         return self.bbox
+      from matplotlib.transforms import Bbox
+      return Bbox.union([ self.axarr[k/self.n, k%self.n].get_position() for k in range(len(self.grid)) ])
+
+   #--------------------------------------------------------------------------
+   # Grids of styles['tile_facets'] facets or more are drawn in bands of rows
+   # of facets by styles['jobs'] processes, all cores by default.  Each band
+   # is drawn on a transparent figure that only holds its part of the whole
+   # figure, and the images of the bands are laid over an image of the
+   # legend and labels, drawn on a figure without facets.  Facets are about
+   # styles['panel_size'] inches wide and high.  Axes share the limits of the
+   # whole grid: bar, quartile and distribution plots first draw the bands
+   # without rendering them to find these limits.
+   #--------------------------------------------------------------------------
+
+   shared_limits = False
+
+   def plot_tiles(self, filename):
+      global TILED
+      import multiprocessing
+      from matplotlib.figure import Figure
+      from matplotlib.backends.backend_agg import FigureCanvasAgg
+      data = self.data
+      rc = plt.rcParams
+      self.dpi = rc['figure.dpi'] if rc['savefig.dpi'] == 'figure' else rc['savefig.dpi']
+      w, h = data.styles.get('panel_size', PANEL_SIZE)
+      width = max(rc['figure.figsize'][0], self.n * w / (rc['figure.subplot.right'] - rc['figure.subplot.left']))
+      height = max(rc['figure.figsize'][1], self.m * h / (rc['figure.subplot.top'] - rc['figure.subplot.bottom']))
+      self.width, self.height = int(round(width * self.dpi)), int(round(height * self.dpi))
+
+      # legend and labels, around one axes in place of the facets
+      with stage('plot.set_legend', groups=len(self.group_levels)):
+         self.figure = Figure(figsize=(inches(self.width, self.dpi), inches(self.height, self.dpi)), dpi=self.dpi)
+         FigureCanvasAgg(self.figure)
+         self.figure.subplots_adjust(hspace=0, wspace=0)
+         self.axarr = np.array([[ self.figure.add_subplot(1, 1, 1) ]])
+         self.tile_mappables()
+         self.set_legend()
+         self.bbox = self.axarr[0, 0].get_position()
+         self.figure.delaxes(self.axarr[0, 0])
+      with stage('plot.set_labels', facets=len(self.grid)):
+         self.set_labels()
+         image = canvas_image(self.figure)
+
+      jobs = data.styles.get('jobs') or multiprocessing.cpu_count()
+      step = max(1, int(math.ceil(self.m / (4.0 * jobs))))
+      bands = [ (r, min(r + step, self.m)) for r in range(0, self.m, step) ]
+      TILED = self
+      pool = None
+      if jobs > 1 and len(bands) > 1 and not multiprocessing.current_process().daemon:
+         pool = multiprocessing.Pool(min(jobs, len(bands)))
+      try:
+         mapper = pool.map if pool is not None else map
+         imapper = pool.imap if pool is not None else itertools.imap
+         limits = None
+         if self.shared_limits:
+            with stage('plot.tiles.limits', bands=len(bands)):
+               parts = mapper(draw_band, [ (band, None) for band in bands ])
+               lims = np.array([ p[0] for p in parts ])
+               limits = ([ [ lims[:, 0, 0].min(), lims[:, 0, 1].min() ], [ lims[:, 1, 0].max(), lims[:, 1, 1].max() ] ],
+                  (min(p[1][0] for p in parts), max(p[1][1] for p in parts)))
+         # bands are laid over the image as they come, so that only a few
+         # band images are held at a time
+         with stage('plot.tiles.draw', bands=len(bands)):
+            tiles = imapper(draw_band, [ (band, limits) for band in bands ])
+            for band, tile in itertools.izip(bands, tiles):
+               bottom, top = self.band_pixels(*band)
+               blend(image[self.height - top:self.height - bottom], tile)
+      finally:
+         TILED = None
+         if pool is not None:
+            pool.close()
+            pool.join()
+
+      with stage('plot.save'):
+         import matplotlib.image
+         matplotlib.image.imsave(filename, image, dpi=self.dpi)
+
+   # mappables of color bar legends, which are drawn without the facets
+   def tile_mappables(self):
+      if self.legend_colorbar:
+         self.mappable = scalar_mappable(cm.copper, Normalize(self.vmin, self.vmax), self.data.styles.get('alpha', None))
+
+   # first and last pixel rows of the image of a band of rows of facets,
+   # counted from the bottom of the figure, with room for tick labels
+   # reaching out of the band
+   def band_pixels(self, first, last):
+      pad = int(TILE_PAD * self.dpi)
+      top = self.height if first == 0 else int(math.ceil(self.position((first, 0)).y1 * self.height)) + pad
+      bottom = 0 if last == self.m else int(math.floor(self.position((last - 1, 0)).y0 * self.height)) - pad
+      return max(bottom, 0), min(top, self.height)
+
+   #--------------------------------------------------------------------------
+   # Draw the facets of rows first to last - 1 of the grid, as plt.subplots
+   # and plot would, on a figure covering their pixel rows.  Without limits,
+   # return the data limits of the axes and the bounds of the value axis;
+   # otherwise, apply the limits of the whole grid and return the RGBA image.
+   #--------------------------------------------------------------------------
+   def draw_band(self, first, last, limits=None):
+      from matplotlib.figure import Figure
+      from matplotlib.backends.backend_agg import FigureCanvasAgg
+      bottom, top = self.band_pixels(first, last)
+      self.figure = Figure(figsize=(inches(self.width, self.dpi), inches(top - bottom, self.dpi)), dpi=self.dpi)
+      FigureCanvasAgg(self.figure)
+      self.figure.patch.set_alpha(0)
+      self.axarr = np.empty((self.m, self.n), dtype=object)
+      shared = None
+      for i in range(first, last):
+         for j in range(self.n):
+            p = self.position((i, j))
+            rect = [ p.x0, (p.y0 * self.height - bottom) / (top - bottom), p.width, p.height * self.height / (top - bottom) ]
+            ax = self.axarr[i, j] = self.figure.add_axes(rect, sharex=shared, sharey=shared)
+            shared = shared or ax
+            if i < self.m - 1:
+               ax.xaxis.set_tick_params(which='both', labelbottom=False, labeltop=False)
+               ax.xaxis.offsetText.set_visible(False)
+            if j > 0:
+               ax.yaxis.set_tick_params(which='both', labelleft=False, labelright=False)
+               ax.yaxis.offsetText.set_visible(False)
+      self.facets = range(first * self.n, last * self.n)
+      self.plot_facets(self.facets)
+      if self.shared_limits and limits is None:
+         points = np.array([ ax.dataLim.get_points() for ax in self.axarr[first:last].flat ])
+         return [ points[:, 0].min(axis=0), points[:, 1].max(axis=0) ], (self.rmin, self.rmax)
+      if limits is not None:
+         points, (self.rmin, self.rmax) = limits
+         if np.isfinite(points).all():
+            shared.dataLim.update_from_data_xy(np.array(points), ignore=False)
+            shared.autoscale_view()
       self.postcompute()
-      self.set_legend()
-      self.set_labels()
-      plt.show()
-
+      return canvas_image(self.figure)
+
+   #--------------------------------------------------------------------------
+   # Create the figure and its m x n axes.  With styles['reuse_figure'], the
+   # figure of the previous plot of the data is reused while it is open and
+   # has the same layout: the plotted artists are removed from its axes and
+   # their limits, ticks and labels are reset, which keeps the axes and ticks
+   # that take long to create.
+   #--------------------------------------------------------------------------
+   def subplots(self):
+      load_matplotlib()
+      data = self.data
+      previous = data._figure if data.styles.get('reuse_figure') else None
+      if previous is not None and plt.fignum_exists(previous[0].number) and previous[1].shape == (self.m, self.n):
+         self.figure, self.axarr = previous
+         for ax in self.figure.axes:
+            if ax not in self.axarr:
+               self.figure.delaxes(ax)   # color bars
+         for ax in self.axarr.flat:
+            clear_axes(ax)
+         del self.figure.legends[:], self.figure.texts[:]
+         self.figure.subplots_adjust(**{ k : plt.rcParams['figure.subplot.' + k] for k in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace') })
+      else:
+         if previous is not None:
+            plt.close(previous[0])
+         self.figure, self.axarr = plt.subplots(self.m, self.n, sharex=True, sharey=True, squeeze=False)
+      if data.styles.get('reuse_figure'):
+         data._figure = self.figure, self.axarr
 
    def precompute(self):
       ''' this function is defined at the child level '''
       pass
 
+   def group_columns(self):
+      ''' columns rows are grouped by, besides facets and groups '''
+      return []
+
+   # attributes set by aggregate, which are kept for the next plots of the data
+   aggregates = ()
+
+   def aggregate(self):
+      ''' this function is defined at the child level '''
+      pass
+
    def postcompute(self):
       ''' this function is defined at the child level '''
       pass
 
 #-----------------------------------------------------------------------------
+# Return axes to the state plt.subplots leaves them in, except for the shared
+# tick labels it hides, without creating their ticks and spines again as
+# Axes.cla does.
+#-----------------------------------------------------------------------------
+
+def clear_axes(ax):
+   from matplotlib.ticker import AutoLocator, NullLocator, ScalarFormatter, NullFormatter
+   for artists in (ax.lines, ax.collections, ax.patches, ax.images, ax.texts, ax.artists, ax.tables):
+      for a in list(artists):
+         a.remove()
+   ax.containers = []
+   ax.legend_ = None
+   ax.set_title('')
+   for axis in (ax.xaxis, ax.yaxis):
+      axis.set_major_locator(AutoLocator())
+      axis.set_major_formatter(ScalarFormatter())
+      axis.set_minor_locator(NullLocator())
+      axis.set_minor_formatter(NullFormatter())
+      axis.isDefault_majloc = axis.isDefault_majfmt = axis.isDefault_minloc = axis.isDefault_minfmt = True
+      axis.set_label_text('')
+   ax.set_aspect('auto')
+   ax.set_xmargin(plt.rcParams['axes.xmargin'])
+   ax.set_ymargin(plt.rcParams['axes.ymargin'])
+   ax.ignore_existing_data_limits = True
+   ax.relim()
+   ax.set_autoscale_on(True)
+   ax.autoscale_view()
+
+#-----------------------------------------------------------------------------
+# Tiled plots: grids from TILE_FACETS facets on are drawn in bands, with
+# facets of PANEL_SIZE inches and TILE_PAD inches of room above and below a
+# band for tick labels.  TILED is the Plot whose bands are drawn, in the
+# processes drawing them.
+#-----------------------------------------------------------------------------
+
+TILE_FACETS = 100
+PANEL_SIZE = (1.6, 1.2)
+TILE_PAD = 0.3
+TILED = None
+
+def draw_band(args):
+   (first, last), limits = args
+   return TILED.draw_band(first, last, limits)
+
+# RGBA pixels of a figure drawn on an Agg canvas, top row first
+def canvas_image(figure):
+   figure.canvas.draw()
+   width, height = figure.canvas.get_width_height()
+   return np.frombuffer(figure.canvas.buffer_rgba(), np.uint8).reshape(height, width, 4).copy()
+
+# size in inches of a figure drawn with a number of pixels; Agg truncates
+# inches * dpi, so half a pixel is added to get exactly that many
+def inches(pixels, dpi):
+   return (pixels + 0.5) / float(dpi)
+
+# lay an RGBA image over the pixels below it, in place
+def blend(below, tile):
+   alpha = tile[..., 3:] / np.float32(255)
+   below[:] = np.round(tile * alpha + below * (1 - alpha))
+
+# mappable for color bars, drawn with alpha
+def scalar_mappable(cmap, norm, alpha=None):
+   from matplotlib.collections import Collection
+   mappable = Collection(cmap=cmap, norm=norm)
+   mappable.set_alpha(alpha)
+   mappable.set_array(np.array([]))
+   return mappable
+
+#-----------------------------------------------------------------------------
+# Scatter plots of more than MAX_POINTS rows (styles['max_points']) are drawn
+# as density plots: counts of rows over a grid of styles['density_bins'] bins
+# per axis, computed for every facet and group in one pass.
+#-----------------------------------------------------------------------------
+
+MAX_POINTS = 1000000
+RASTERIZE_POINTS = 10000
 
 class QQPlot(Plot):
+   aggregates = ('edgex', 'edgey', 'counts', 'means')
+
    def __init__(self, data):
       super(QQPlot, self).__init__(data)
 
    def precompute(self):
-      def f(values):
-         r = min(values), max(values)
+      def f(c):
+         r = self.data.ranges.get(c.name) or (c.min, c.max)
          buffer = 0.1 * abs(r[1]-r[0])
          return r[0]-buffer, r[1]+buffer
       self.rangex = f(self.data.x)
       self.rangey = f(self.data.y)
+      self.density = self.data.xy == 'density' or \
+         (self.data.xy == 'discrete' and self.data.nrow > self.data.styles.get('max_points', MAX_POINTS))
+
+   def aggregate(self):
+      if not self.density:
+         return
+      def edges(c):
+         if c.name in self.data.bins:
+            return self.data.bins[c.name]
+         r = self.data.ranges.get(c.name) or (c.min, c.max)
+         return np.linspace(r[0], r[1], self.data.styles.get('density_bins', 100)+1)
+      def bin(c, e):
+         return np.clip(np.searchsorted(e, c.values, side='right') - 1, 0, len(e) - 2)
+
+      self.edgex, self.edgey = edges(self.data.x), edges(self.data.y)
+      nx, ny = len(self.edgex)-1, len(self.edgey)-1
+      cells, shape = self.groupby.cell, self.groupby.shape
+      if self.legend_colorbar:   # bins are colored by the mean of the group column
+         cells, shape = cells // shape[2], shape[:2]
+      code = (cells * nx + bin(self.data.x, self.edgex)) * ny + bin(self.data.y, self.edgey)
+      size = int(np.prod(shape)) * nx * ny
+      w = self.data.weights
+      self.counts = np.bincount(code, weights=w, minlength=size).reshape(shape + (nx, ny))
+      if self.legend_colorbar:
+         v = self.data.group.values if w is None else self.data.group.values * w
+         sums = np.bincount(code, weights=v, minlength=size).reshape(self.counts.shape)
+         self.means = sums / np.maximum(self.counts, 1)
+
+   def update_plot_options(self, groups, options):
+      if self.data.xy == 'sequential':
+         super(QQPlot, self).update_plot_options(groups, options)
 
    def plot_groups(self, idx, groups, options):
-      for key, g in groups.items():
-         x = [r[self.data.x.name] for r in g]
-         y = [r[self.data.y.name] for r in g]
-         if self.data.xy == 'discrete':
-            options[key]['marker'] = 'o'
-            if not self.legend_colorbar:
-               options[key]['facecolors'] = options[key]['edgecolors'] = [options[key]['color']] * len(x)
-               del options[key]['color']
-            plot_res = self.axarr[idx].scatter(x,y, **options[key])
-            if 'cmap' in options[key]:
-               self.mappable = plot_res
-         elif self.data.xy == 'sequential':
+      if self.density:
+         self.plot_density(idx, groups, options)
+      elif self.data.xy == 'discrete':
+         self.plot_scatter(idx)
+      else:
+         for key, cell in groups.items():
+            g = self.groupby.indices(cell)
+            x = self.data.x.values[g]
+            y = self.data.y.values[g]
             options[key]['marker'] = None
+            x, y = m4(x, y, self.line_buckets(idx))
             self.axarr[idx].plot(x,y, **options[key])
 
       self.axarr[idx].set_xlim(*self.rangex)
       self.axarr[idx].set_ylim(*self.rangey)
 
+   #--------------------------------------------------------------------------
+   # All the points of a facet are drawn as one collection, group after group,
+   # with colors looked up by group code in an array of the colors of
+   # color_map.  Collections of more than styles['rasterize_points'] points
+   # are drawn as images in vector formats.
+   #--------------------------------------------------------------------------
+   def plot_scatter(self, idx):
+      rows = self.groupby.indices(idx)
+      if not len(rows):
+         return
+      options = dict(marker='o', alpha=self.data.styles.get('alpha', None),
+         rasterized=len(rows) > self.data.styles.get('rasterize_points', RASTERIZE_POINTS))
+      if self.data.size is not None:
+         options['s'] = self.marker_sizes(rows)
+      if self.legend_colorbar:
+         options.update(c=self.data.group.values[rows], cmap=cm.copper, vmin=self.vmin, vmax=self.vmax)
+      else:
+         levels = self.data.group.levels if self.data.group is not None else [None]
+         palette = np.array([ self.color_map[v] for v in levels ])
+         options['facecolors'] = options['edgecolors'] = palette[self.groupby.cell[rows] % self.groupby.shape[2]]
+      plot_res = self.axarr[idx].scatter(self.data.x.values[rows], self.data.y.values[rows], **options)
+      if self.legend_colorbar:
+         self.mappable = plot_res
+
+   #--------------------------------------------------------------------------
+   # Number of buckets lines are downsampled to: one per pixel column of the
+   # axes when saved, or styles['line_points'] / 4.
+   #--------------------------------------------------------------------------
+   def line_buckets(self, idx):
+      if self.data.styles.get('line_points'):
+         return self.data.styles['line_points'] // 4
+      dpi = plt.rcParams['savefig.dpi']
+      scale = max(1.0, dpi / self.figure.dpi) if dpi != 'figure' else 1.0
+      return int(math.ceil(self.axarr[idx].get_window_extent().width * scale))
+
+   #--------------------------------------------------------------------------
+   # Each group is drawn as an image in its color, with opacity growing with
+   # the log of the count of rows in a bin.  With a color bar legend, bins are
+   # colored by the mean of the group column instead.  Without groups, counts
+   # get a color bar of their own.
+   #--------------------------------------------------------------------------
+   def plot_density(self, idx, groups, options):
+      ax = self.axarr[idx]
+      extent = (self.edgex[0], self.edgex[-1], self.edgey[0], self.edgey[-1])
+      scale = np.log1p(self.counts.max()) or 1.0
+      alpha = self.data.styles.get('alpha', None) or 1.0
+      if self.legend_colorbar:
+         self.mappable = cm.ScalarMappable(cmap=cm.copper, norm=Normalize(self.vmin, self.vmax))
+         self.mappable.set_array([])
+         rgba = self.mappable.to_rgba(self.means[idx])
+         rgba[..., 3] = alpha * np.log1p(self.counts[idx]) / scale
+         ax.imshow(rgba.transpose(1, 0, 2), origin='lower', extent=extent, aspect='auto', interpolation='nearest')
+      elif self.data.group is None:
+         cmap, norm, alpha = self.count_colors()
+         counts = np.ma.masked_equal(self.counts[idx + (0,)].T, 0)
+         self.density_mappable = ax.imshow(counts, cmap=cmap, norm=norm, alpha=alpha,
+            origin='lower', extent=extent, aspect='auto', interpolation='nearest')
+      else:
+         # levels of discrete groups share a color and differ in alpha
+         for key, cell in groups.items():
+            color = self.color_map[key]
+            rgba = np.zeros(self.counts.shape[:-3:-1] + (4,))
+            rgba[..., :3] = color[:3]
+            rgba[..., 3] = alpha * (color[3] if len(color) > 3 else 1.0) * np.log1p(self.counts[cell].T) / scale
+            ax.imshow(rgba, origin='lower', extent=extent, aspect='auto', interpolation='nearest')
+
+   def set_legend(self):
+      super(QQPlot, self).set_legend()
+      if self.density and self.data.group is None:
+         legend = self.figure.colorbar(self.density_mappable, ax=self.axarr.ravel().tolist(), aspect=20)
+         legend.ax.set_title('count', fontsize='medium')
+
+   def tile_mappables(self):
+      if self.density:
+         if self.legend_colorbar:
+            self.mappable = scalar_mappable(cm.copper, Normalize(self.vmin, self.vmax))
+         elif self.data.group is None:
+            self.density_mappable = scalar_mappable(*self.count_colors())
+      else:
+         super(QQPlot, self).tile_mappables()
+
+   # colormap, norm and alpha of counts drawn without groups
+   def count_colors(self):
+      cmap = LinearSegmentedColormap.from_list('density', [ (1,1,1,0), self.color_map[None] ])
+      return cmap, LogNorm(1, max(self.counts.max(), 1)), self.data.styles.get('alpha', None) or 1.0
+
 #-----------------------------------------------------------------------------
 
+# styles['error_bars'] of 'average' bars -> multiple of the standard error
+# drawn on each side of the mean
+ERROR_BARS = { 'se' : 1.0, 'ci' : 1.96 }
+
 class CQPlot(Plot):
+   aggregates = ('stats', 'edges', 'hist')
+   shared_limits = True
+
    def __init__(self, data):
       super(CQPlot, self).__init__(data)
 
@@ -447,9 +1556,52 @@ class CQPlot(Plot):
       else:
          raise Exception("unsupported")
 
+   def group_columns(self):
+      if self.data.xy == 'distribution':
+         return []
+      return [ self.cvar ]
+
+   #--------------------------------------------------------------------------
+   # Quartiles of more than MAX_POINTS rows (styles['max_points']) and of
+   # summarized data come from quantile sketches, with a rank error of
+   # styles['sketch_error'].
+   #
+   # Distributions of all groups and facets are counted in one pass over the
+   # same styles['bars'] bins of the range of x, or the bins of summarized data.
+   #
+   # Averages have standard errors with styles['error_bars'] ('se' or 'ci').
+   #--------------------------------------------------------------------------
+   def aggregate(self):
+      if self.data.xy == 'distribution':
+         if self.data.x is None:
+            raise Exception("Must set x variable to plot distributions.")
+         x = self.data.x
+         if x.name in self.data.bins:
+            self.edges = self.data.bins[x.name]
+         else:
+            m, M = self.data.ranges.get(x.name) or (x.min, x.max)
+            if m == M:
+               m, M = m - 0.5, M + 0.5
+            self.edges = np.linspace(m, M, self.data.styles.get('bars', 10) + 1)
+         self.hist = self.groupby.histogram(x.values, self.edges)
+      elif self.data.xy == 'quartiles':
+         if self.qvar.name in self.data.sketches:
+            sketches = self.groupby.merge(self.data.sketches[self.qvar.name])
+         elif self.data.weights is not None:
+            raise Exception("Quartiles of summarized data need stream(..., sketch_error=...).")
+         elif self.data.nrow > self.data.styles.get('max_points', MAX_POINTS):
+            sketches = self.groupby.sketch(self.qvar.values, self.data.styles.get('sketch_error', 0.01))
+         else:
+            self.stats = self.groupby.quartiles(self.qvar.values)
+            return
+         self.stats = np.array([ boxplot_stats(s) for s in sketches.flat ]).reshape(sketches.shape)
+      elif self.data.xy != 'distribution':
+         sem = self.data.xy == 'average' and self.data.styles.get('error_bars') is not None
+         self.stats = self.groupby.aggregate(self.qvar.values if self.qvar is not None else None, sem)
+
    def postcompute(self):
-      labels = sorted(set(self.cvar))
-      for k, key in enumerate(sorted(self.rows)):
+      labels = self.cvar.levels
+      for k in self.facets:
          idx = (k/self.n, k%self.n)
          if self.data.xy == 'distribution':
             self.axarr[idx].set_ybound(self.rmin, self.rmax)
@@ -473,50 +1625,51 @@ class CQPlot(Plot):
    def plot_groups(self, idx, groups, options):
       i = 0
       for key in sorted(groups.keys()):
-         g = groups[key]
+         cell = groups[key]
          if self.data.xy == 'distribution':
-            if self.data.x is None:
-               raise Exception("Must set x variable to plot distributions.")
-            values = [r[self.data.x.name] for r in g]
-            options[key]['normed'] = self.data.styles.get('normed',False)
-            options[key]['histtype'] = 'stepfilled'
-            self.axarr[idx].hist(values, self.data.styles.get('bars',10), **options[key])
+            counts = self.hist[cell]
+            if counts.any():
+               options[key]['normed'] = self.data.styles.get('normed',False)
+               options[key]['histtype'] = 'stepfilled'
+               self.axarr[idx].hist(self.edges[:-1], self.edges, weights=counts, **options[key])
+         elif self.data.xy == 'quartiles':
+            bar_width = 1.0 /float(len(groups)+1)
+            stats = self.stats[cell].tolist()
+            positions = [ j + (i+1)*bar_width for j in range(len(stats)) ]
+            vert = self.data.x is self.cvar
+            plot_res = self.axarr[idx].bxp(stats, vert=vert, patch_artist=True, positions=positions, widths=.8*bar_width)
+            for box in plot_res['boxes']:
+               box.set(color=options[key]['color'])
+            for whisker in plot_res['whiskers']:
+               whisker.set(color='grey')
+            for cap in plot_res['caps']:
+               cap.set(color='grey')
+            for flier in plot_res['fliers']:
+               flier.set(color='grey', markeredgecolor='grey', marker='+')
+            for median in plot_res['medians']:
+               median.set(color='#333333')
          else:
-            _, subgroups = split_rows_by_col(g, self.cvar)
-            keys = sorted(subgroups.keys())
             values = None
-            if self.data.xy == 'quartiles':
-               bar_width = 1.0 /float(len(groups)+1)
-               values = [ [r[self.qvar.name] for r in subgroups[k]] for k in keys ]
-               positions = [ j + (i+1)*bar_width for j in range(len(subgroups)) ]
+            if self.data.xy == 'count' or self.qvar is None:
+               values = self.stats['count'][cell]
+            elif self.data.xy == 'sum':
+               values = self.stats['sum'][cell]
+            elif self.data.xy == 'average':
+               values = self.stats['mean'][cell]
+               if 'sem' in self.stats:
+                  error = self.stats['sem'][cell] * ERROR_BARS[self.data.styles['error_bars']]
+                  options[key]['yerr' if self.data.x is self.cvar else 'xerr'] = error
+                  options[key]['ecolor'] = '#333333'
+                  options[key]['capsize'] = 2
+            if values is not None:
+               bar_width = (1.0 - self.data.styles['bar_spacing']) /float(len(groups))
+               positions = [ j + i*bar_width for j in range(len(values)) ]
                if self.data.x is self.cvar:
-                  plot_res = self.axarr[idx].boxplot(values, patch_artist=True, positions=positions, widths=.8*bar_width)
+                  self.axarr[idx].bar(positions, values, bar_width, **options[key])
+               elif self.data.y is self.cvar:
+                  self.axarr[idx].barh(positions, values, bar_width, **options[key])
                else:
-                  plot_res = self.axarr[idx].boxplot(values, vert=False, patch_artist=True, positions=positions, widths=.8*bar_width)
-               for box in plot_res['boxes']:
-                  box.set(color=options[key]['color'])
-               for whisker in plot_res['whiskers']:
-                  whisker.set(color='grey')
-               for cap in plot_res['caps']:
-                  cap.set(color='grey')
-               for flier in plot_res['fliers']:
-                  flier.set(color='grey', markeredgecolor='grey', marker='+')
-               for median in plot_res['medians']:
-                  median.set(color='#333333')
-            else:
-               bar_width = (1.0 - self.data.styles['bar_spacing']) /float(len(groups))
-               positions = [ j + i*bar_width for j in range(len(subgroups)) ]
-               if self.data.xy == 'count' or self.qvar is None:
-                  values = [len(subgroups[k]) if k in subgroups else 0 for k in keys]
-               elif self.data.xy == 'sum':
-                  values = [sum(r[self.qvar.name] for r in subgroups[k]) if k in subgroups else 0 for k in keys]
-               if values is not None:
-                  if self.data.x is self.cvar:
-                     self.axarr[idx].bar(positions, values, bar_width, **options[key])
-                  elif self.data.y is self.cvar:
-                     self.axarr[idx].barh(positions, values, bar_width, **options[key])
-                  else:
-                     raise Exception("Unknown plot")
+                  raise Exception("Unknown plot")
 
          i += 1
 
@@ -533,59 +1686,198 @@ class CQPlot(Plot):
 if __name__ == '__main__':
    MAX_NUM_CAT = 8
 
+   # show the current plot, or queue it for rendering to --output
+   def draw():
+      if args.output is None and args.follow is None:
+         data.plot()
+      else:
+         variants.append(data.settings())
+
+   def filename(i, settings):
+      name = os.path.splitext(os.path.basename(args.file))[0]
+      parts = [ name, '%02d' % i, settings['x'], settings['y'] ]
+      parts += [ '%s-%s' % (k, settings[k]) for k in ('xx', 'yy') if settings[k] is not None ]
+      if settings['group'] is not None:
+         t = settings['types'][settings['group']]
+         parts.append('group-%s-%s' % (settings['group'], ('categorical', 'discrete', 'continuous')[t]))
+      parts.append(settings['xy'])
+      name = '_'.join(re.sub(r'[^\w.-]+', '-', str(p)) for p in parts if p is not None)
+      return os.path.join(args.output, '%s.%s' % (name, args.format))
+
+   # runs in a worker process, which shares data with the parent
+   def render(variant):
+      i, settings = variant
+      data.restore(settings)
+      data.plot(filename(i, settings))
+      return filename(i, settings)
+
+   # draw a plot, and draw it again whenever rows are appended to the file;
+   # with --output, its file is saved again
+   def follow(settings):
+      load_matplotlib()
+      data.styles['reuse_figure'] = True
+      data.restore(settings)
+      name = None
+      if args.output is not None:
+         if not os.path.isdir(args.output):
+            os.makedirs(args.output)
+         name = filename(0, settings)
+      else:
+         plt.ion()
+      try:
+         while True:
+            data.plot(name)
+            if name is not None:
+               print(name)
+            while not tail.update():
+               if name is None:
+                  plt.pause(args.follow)
+               else:
+                  time.sleep(args.follow)
+      except KeyboardInterrupt:
+         pass
+
    def plot2():
       if args.z is not None:
          if args.u is not None:
-            assert(len(set(data[args.u])) <= MAX_NUM_CAT)
+            assert(data[args.u].cardinality <= args.max_facets)
             if args.v is not None:
-               assert(len(set(data[args.v])) <= MAX_NUM_CAT)
+               assert(data[args.v].cardinality <= MAX_NUM_CAT)
                data.xx = args.z
                data.yy = args.u
                data.group = args.v
-               data.plot()
+               draw()
             else:
                data.xx = args.z
                data.yy = args.u
-               data.plot()
+               draw()
          else:
-            if len(set(data[args.z])) <= MAX_NUM_CAT:
+            if data[args.z].cardinality <= args.max_facets:
                data.xx = args.z
-               data.plot()
+               draw()
                data.xx = None
                data.yy = args.z
-               data.plot()
+               draw()
                data.yy = None
 
-            if data.x.type!=0 or len(set(data[args.z])) <= MAX_NUM_CAT:
+            if data.x.type!=0 or data[args.z].cardinality <= MAX_NUM_CAT:
                data.group = args.z
-               data.plot()
-               if data.group.type!=0 and len(set(data[args.z])) <= MAX_NUM_CAT:
+               draw()
+               if data.group.type!=0 and data[args.z].cardinality <= MAX_NUM_CAT:
+                  xy = data.xy
                   data.group.type = 0
-                  data.plot()
+                  if xy == bars:   # the type setter resets xy to the default
+                     data.xy = bars
+                  draw()
 
       else:
-         data.plot()
+         draw()
 
    import argparse
    parser = argparse.ArgumentParser()
-   parser.add_argument("file", help="data file in tab or comma separated format.  Must have a header with column names.")
+   parser.add_argument("file", help="data file in tab or comma separated format, possibly compressed (.gz, .bz2, .xz, .zst).  Must have a header with column names.")
    parser.add_argument("x", help="column representing the x axis.")
    parser.add_argument("y", nargs='?', default=None, help="column representing the y axis.")
    parser.add_argument("z", nargs='?', default=None)
    parser.add_argument("u", nargs='?', default=None)
    parser.add_argument("v", nargs='?', default=None)
    # parser.add_argument("-c", "--comma", action="store_true", default=False, help="separator is comma, instead of tab (which is default).")
+   parser.add_argument("--stream", action="store_true", default=False, help="read the file in chunks and plot sums, counts and quartiles per category; x or y must be categorical.")
+   parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="number of rows read at a time with --stream.")
+   parser.add_argument("--no-cache", action="store_true", default=False, help="do not use or update the cache of parsed files.")
+   parser.add_argument("--clear-cache", action="store_true", default=False, help="remove the cached copy of the file before reading it.")
+   parser.add_argument("-o", "--output", default=None, help="save every plot to an image file in this directory instead of showing it.")
+   parser.add_argument("--format", default="png", help="image format of the files saved with --output.")
+   parser.add_argument("-j", "--jobs", type=int, default=None, help="number of processes reading the file and rendering plots with --output; all cores by default (files under 16 MB are read by one process).")
+   parser.add_argument("--where", action='append', default=None, metavar="CONDITION", help="only read rows meeting a condition such as 'year == 2008' or 'hwy >= 30' (==, !=, <, <=, >, >=); may be repeated.")
+   parser.add_argument("--head", type=int, default=None, metavar="N", help="only read the first N rows.")
+   parser.add_argument("--sample", type=int, default=None, metavar="N", help="read a uniform random sample of N rows.")
+   parser.add_argument("--max-facets", type=int, default=MAX_NUM_CAT, metavar="N", help="largest number of levels of the columns facets are split by (%d by default).  Grids of %d facets or more are drawn in bands by --jobs processes." % (MAX_NUM_CAT, TILE_FACETS))
+   parser.add_argument("--error-bars", choices=sorted(ERROR_BARS), default=None, help="plot averages instead of sums per category, with bars of their standard error (se) or 95%% confidence interval (ci).")
+   parser.add_argument("--follow", nargs='?', type=float, const=2.0, default=None, metavar="SECONDS", help="keep reading rows appended to the file and redraw the first plot every SECONDS (2 by default) when there are new rows.")
+   parser.add_argument("--profile", action="store_true", default=False, help="time each stage of reading and plotting and print a summary.  Plots are rendered in this process.")
+   parser.add_argument("--trace", default=None, metavar="FILE", help="as --profile, but save a JSON trace of the stages to FILE.")
 
    args = parser.parse_args()
-   data = read(args.file)
+   variants = []
+   profile = args.profile or args.trace is not None
+   if profile:
+      import instrument
+      profiler = instrument.Profiler()
+      instrument.add_hook(profiler)
+   if args.output is not None:
+      import matplotlib
+      matplotlib.use('Agg')
+   if args.clear_cache:
+      cache.clear(args.file)
+   if args.follow is not None and (args.stream or args.head is not None or args.sample is not None):
+      parser.error("--follow cannot be used with --stream, --head or --sample.")
+   if args.stream:
+      keys = [ c for c in (args.z, args.u, args.v) if c is not None ]
+      values = [ c for c in (args.x, args.y) if c is not None ]
+      if args.sample is not None:
+         parser.error("--sample cannot be used with --stream.")
+      if args.error_bars is not None:
+         parser.error("--error-bars cannot be used with --stream.")
+      # summaries sum the values of each category, so one of x and y must be
+      # categorical; their types are taken from the first chunk of rows
+      if args.y is not None:
+         first = read(args.file, jobs=1, columns=values, head=args.chunksize)
+         if qq_type(first[args.x], first[args.y]):
+            parser.error("--stream needs x or y to be categorical.")
+      data = stream(args.file, keys=keys, values=values, sketch_error=0.01, chunksize=args.chunksize, where=args.where, head=args.head)
+   elif args.follow is not None:
+      columns = [ c for c in (args.x, args.y, args.z, args.u, args.v) if c is not None ]
+      tail = Tail(args.file, columns=columns, where=args.where)
+      data = tail.read()
+   else:
+      columns = [ c for c in (args.x, args.y, args.z, args.u, args.v) if c is not None ]
+      data = read(args.file, cached=not args.no_cache, jobs=args.jobs, columns=columns,
+         where=args.where, head=args.head, sample=args.sample)
    data.set(x=args.x, y=args.y, xy=None)
-   if data.y is not None:
+   if args.error_bars is not None:
+      if data.y is None or not cq_type(data.x, data.y):
+         parser.error("--error-bars needs one categorical and one quantitative column.")
+      data.xy = 'average'
+   bars = data.xy
+   data.styles['jobs'] = args.jobs
+   data.styles['error_bars'] = args.error_bars
+   if args.output is not None:
+      data.styles['reuse_figure'] = True
+   if data.y is not None and data.weights is not None:
+      plot2()
+      if data.x.type==0 or data.y.type==0:
+         data.xy = "quartiles"
+         plot2()
+   elif data.y is not None:
       plot2()
       if data.x.type==0:
          data.xy = "quartiles"
          plot2()
-      elif len(set(data.x))<=MAX_NUM_CAT:
+      elif data.x.cardinality<=MAX_NUM_CAT:
          data.x.type = 0
          data.xy = "quartiles"
          plot2()
 
+
+   if args.follow is not None:
+      if variants:
+         follow(variants[0])
+   elif variants:
+      if not os.path.isdir(args.output):
+         os.makedirs(args.output)
+      variants = list(enumerate(variants))
+      if args.jobs == 1 or profile:
+         files = [ render(v) for v in variants ]
+      else:
+         import multiprocessing
+         pool = multiprocessing.Pool(args.jobs)
+         files = pool.map(render, variants)
+         pool.close()
+      for f in files:
+         print(f)
+
+   if args.trace is not None:
+      profiler.save(args.trace)
+   elif profile:
+      sys.stderr.write(profiler.summary() + '\n')
@@ -0,0 +1,220 @@
+'''
+Plot server: keeps data files read in memory and draws plots on request.
+
+   python server.py [--socket PATH] [--memory MB] [-j JOBS]
+
+Requests are JSON objects, one per line, read from standard input or from
+connections to the Unix socket PATH; each gets a JSON reply on one line, on
+standard output or on its connection.  For example:
+
+   {"id": 1, "file": "data/mpg.csv", "x": "cty", "y": "hwy", "group": "cyl",
+    "types": {"cyl": "categorical"}, "styles": {"alpha": 0.5}}
+
+   {"id": 1, "format": "png", "image": "iVBORw0KGgo..."}
+
+Requests:
+   file : data file to plot.
+   x, y, xx, yy, group, size : columns of the plot, as in Data.set.
+   z, u, v : columns as given to qq.py: z is the group; z and u are the
+      columns and rows of facets; z, u and v are facets and group.
+   xy : kind of plot ('discrete', 'sequential', 'sum', 'quartiles', ...);
+      the default one for the types of x and y otherwise.
+   types : types to give columns for this plot (categorical, discrete or
+      continuous).
+   styles : styles of the plot ('alpha', 'max_points', ...).
+   read : options of read (sep, header, where, head, sample, columns).
+   format : image format, png by default.
+   output : file to save the image to, instead of replying with its bytes.
+   id : returned with the reply, which may come out of order.
+Replies hold format and image, the image encoded in base64, or output; or
+error, if the plot could not be drawn.
+'''
+import base64
+import collections
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import SocketServer
+
+import matplotlib
+matplotlib.use('Agg')
+import qq
+
+#-----------------------------------------------------------------------------
+# Data read by this process, most recently used last, under the file name and
+# read options.  Data files changed since they were read are read again; the
+# least recently used data are dropped while they hold more than MEMORY
+# bytes, but the last one is always kept.
+#-----------------------------------------------------------------------------
+
+DATASETS = collections.OrderedDict()
+MEMORY = 1024 * 2**20
+
+def dataset(filename, options):
+   key = (os.path.abspath(filename), json.dumps(options, sort_keys=True))
+   st = os.stat(filename)
+   stamp = (st.st_size, st.st_mtime)
+   entry = DATASETS.pop(key, None)
+   if entry is None or entry[0] != stamp:
+      options = { str(k) : v for k, v in options.items() }
+      entry = (stamp, qq.read(filename, cached=True, jobs=1, **options))
+   DATASETS[key] = entry
+   while len(DATASETS) > 1 and sum(data.nbytes for stamp, data in DATASETS.values()) > MEMORY:
+      DATASETS.popitem(last=False)
+   return entry[1]
+
+#-----------------------------------------------------------------------------
+# Draw the plot of a request and return the image bytes.  Types and styles
+# are only changed for this plot; the figure is kept for the next plot of the
+# same data.
+#-----------------------------------------------------------------------------
+
+SETTINGS = ('x', 'y', 'xx', 'yy', 'group', 'size')
+POSITIONAL = { 1 : ('group',), 2 : ('xx', 'yy'), 3 : ('xx', 'yy', 'group') }
+
+def draw(data, request, format):
+   settings = { k : request.get(k) for k in SETTINGS }
+   positional = [ request[k] for k in ('z', 'u', 'v') if request.get(k) is not None ]
+   if positional:
+      settings.update(zip(POSITIONAL[len(positional)], positional))
+   types = request.get('types') or {}
+   saved_types = { name : data[name].type for name in types }
+   styles = data.styles
+   data.styles = dict(styles, reuse_figure=True)
+   data.styles.update(request.get('styles') or {})
+   try:
+      data.set(**settings)
+      for name, t in types.items():
+         data[name].type = t
+      data.xy = request.get('xy')
+      image = io.BytesIO()
+      with qq.plt.rc_context({ 'savefig.format' : format }):
+         data.plot(image)
+      return image.getvalue()
+   finally:
+      data.styles = styles
+      for name, t in saved_types.items():
+         if data[name].type != t:
+            data[name].type = t
+
+#-----------------------------------------------------------------------------
+# Answer a request, in a worker process; returns the reply as a JSON line.
+#-----------------------------------------------------------------------------
+
+def handle(request):
+   reply = {}
+   try:
+      if not isinstance(request, dict):
+         raise ValueError('request is not a JSON object: %s' % json.dumps(request))
+      if 'id' in request:
+         reply['id'] = request['id']
+      format = request.get('format', 'png')
+      image = draw(dataset(request['file'], request.get('read') or {}), request, format)
+      reply['format'] = format
+      if request.get('output'):
+         with open(request['output'], 'wb') as f:
+            f.write(image)
+         reply['output'] = request['output']
+      else:
+         reply['image'] = base64.b64encode(image)
+   except Exception as e:
+      reply['error'] = '%s: %s' % (type(e).__name__, e)
+   return json.dumps(reply)
+
+# A request line, or the reply to a line that is not valid JSON.
+def parse(line):
+   try:
+      return json.loads(line), None
+   except ValueError as e:
+      return None, json.dumps(dict(error='%s: %s' % (type(e).__name__, e)))
+
+#-----------------------------------------------------------------------------
+# Worker processes import pyplot once, share the memory budget and leave
+# interrupts to the server.
+#-----------------------------------------------------------------------------
+
+def initialize(memory):
+   global MEMORY
+   MEMORY = memory
+   signal.signal(signal.SIGINT, signal.SIG_IGN)
+   qq.load_matplotlib()
+
+def pool(jobs, memory):
+   import multiprocessing
+   jobs = jobs or multiprocessing.cpu_count()
+   return multiprocessing.Pool(jobs, initialize, (memory // jobs,))
+
+#-----------------------------------------------------------------------------
+# Requests from standard input, answered as soon as a worker is done with
+# each of them.
+#-----------------------------------------------------------------------------
+
+def serve_stdin(workers):
+   lock = threading.Lock()
+   def write(reply):
+      with lock:
+         sys.stdout.write(reply + '\n')
+         sys.stdout.flush()
+   for line in iter(sys.stdin.readline, ''):
+      if not line.strip():
+         continue
+      request, error = parse(line)
+      if error is not None:
+         write(error)
+      else:
+         workers.apply_async(handle, (request,), callback=write)
+   workers.close()
+   workers.join()
+
+#-----------------------------------------------------------------------------
+# Requests from connections to a Unix socket, each connection in a thread;
+# the requests of a connection are answered in order.
+#-----------------------------------------------------------------------------
+
+class Handler(SocketServer.StreamRequestHandler):
+   def handle(self):
+      for line in iter(self.rfile.readline, ''):
+         if not line.strip():
+            continue
+         request, reply = parse(line)
+         if reply is None:
+            reply = self.server.workers.apply(handle, (request,))
+         self.wfile.write(reply + '\n')
+         self.wfile.flush()
+
+class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+   daemon_threads = True
+
+def serve_socket(workers, path):
+   if os.path.exists(path):
+      os.remove(path)
+   server = Server(path, Handler)
+   server.workers = workers
+   try:
+      server.serve_forever()
+   finally:
+      server.server_close()
+      os.remove(path)
+      workers.terminate()
+
+#-----------------------------------------------------------------------------
+
+if __name__ == '__main__':
+   import argparse
+   parser = argparse.ArgumentParser()
+   parser.add_argument("--socket", default=None, metavar="PATH", help="serve requests on this Unix socket instead of standard input.")
+   parser.add_argument("--memory", type=float, default=MEMORY / 2**20, metavar="MB", help="memory for data kept between requests, shared by the workers.")
+   parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes; all cores by default.")
+   args = parser.parse_args()
+
+   workers = pool(args.jobs, int(args.memory * 2**20))
+   try:
+      if args.socket is None:
+         serve_stdin(workers)
+      else:
+         serve_socket(workers, args.socket)
+   except KeyboardInterrupt:
+      workers.terminate()
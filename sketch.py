@@ -0,0 +1,97 @@
+import math
+import numpy as np
+
+#-----------------------------------------------------------------------------
+# KLL quantile sketch.
+#
+# Values are kept in a stack of compactors; an item at level h stands for 2^h
+# values.  A compactor over capacity is sorted and every other item moves up
+# one level, so memory stays around 3k items whatever the number of values.
+# Sketches of disjoint parts of the data can be merged.  The rank error of a
+# quantile is about 2/k, so k = 2/error.
+#-----------------------------------------------------------------------------
+
+class Sketch(object):
+   def __init__(self, error=0.01):
+      self.k = int(math.ceil(2.0 / error))
+      self.compactors = [ np.empty(0) ]
+      self.n = 0
+      self.sum = 0.0
+      self.min, self.max = np.inf, -np.inf
+      self.random = np.random.RandomState(0)
+
+   def update(self, values):
+      values = np.asarray(values, dtype=np.float64)
+      if len(values) == 0:
+         return
+      self.n += len(values)
+      self.sum += values.sum()
+      self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+      self.compactors[0] = np.concatenate((self.compactors[0], values))
+      self.compress()
+
+   def merge(self, other):
+      self.n += other.n
+      self.sum += other.sum
+      self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+      while len(self.compactors) < len(other.compactors):
+         self.compactors.append(np.empty(0))
+      for h, items in enumerate(other.compactors):
+         self.compactors[h] = np.concatenate((self.compactors[h], items))
+      self.compress()
+
+   def capacity(self, h):
+      return max(2, int(self.k * (2.0/3) ** (len(self.compactors) - 1 - h)))
+
+   def compress(self):
+      h = 0
+      while h < len(self.compactors):
+         items = self.compactors[h]
+         if len(items) > self.capacity(h):
+            if h + 1 == len(self.compactors):
+               self.compactors.append(np.empty(0))
+            items = np.sort(items)
+            odd = len(items) % 2
+            up = items[odd + self.random.randint(2)::2]
+            self.compactors[h] = items[:odd]
+            self.compactors[h+1] = np.concatenate((self.compactors[h+1], up))
+         h += 1
+
+   # sorted retained items and the number of values each one stands for
+   def items(self):
+      items = np.concatenate(self.compactors)
+      weights = np.concatenate([ np.full(len(c), 2.0**h) for h, c in enumerate(self.compactors) ])
+      order = np.argsort(items, kind='mergesort')
+      return items[order], weights[order]
+
+   def quantiles(self, qs):
+      items, weights = self.items()
+      if len(items) == 0:
+         return np.full(len(qs), np.nan)
+      rank = np.cumsum(weights) - 0.5 * weights
+      return np.interp(np.asarray(qs) * weights.sum(), rank, items)
+
+#-----------------------------------------------------------------------------
+# Box plot statistics of a sketch, as the dictionaries that Axes.bxp draws.
+# Fliers are the retained items beyond the whiskers, plus the exact min and
+# max when they lie beyond, capped at max_fliers evenly spaced values.
+#-----------------------------------------------------------------------------
+
+def boxplot_stats(sketch, whis=1.5, max_fliers=100):
+   if sketch is None or sketch.n == 0:
+      return dict(mean=np.nan, med=np.nan, q1=np.nan, q3=np.nan, iqr=np.nan, cilo=np.nan, cihi=np.nan,
+         whislo=np.nan, whishi=np.nan, fliers=np.array([]))
+
+   q1, med, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+   iqr = q3 - q1
+   items, _ = sketch.items()
+   items = np.concatenate(([sketch.min], items, [sketch.max]))
+   inside = items[(items >= q1 - whis*iqr) & (items <= q3 + whis*iqr)]
+   whislo = min(inside.min(), q1) if len(inside) else q1
+   whishi = max(inside.max(), q3) if len(inside) else q3
+   fliers = np.unique(items[(items < whislo) | (items > whishi)])
+   if len(fliers) > max_fliers:
+      fliers = fliers[np.linspace(0, len(fliers)-1, max_fliers).astype(np.intp)]
+   ci = 1.57 * iqr / math.sqrt(sketch.n)
+   return dict(mean=sketch.sum/sketch.n, med=med, q1=q1, q3=q3, iqr=iqr, cilo=med-ci, cihi=med+ci,
+      whislo=whislo, whishi=whishi, fliers=fliers)
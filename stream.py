@@ -0,0 +1,142 @@
+import numpy as np
+from sketch import Sketch
+
+#-----------------------------------------------------------------------------
+# Incremental summary of a data file read in chunks.
+#
+# Rows are grouped by the values of the key columns; for each combination of
+# keys the summary keeps the number of rows and the sum of every value column.
+# Binned columns are keys whose values are replaced by the index of their bin.
+# Running min/max are kept for every quantitative column, and with
+# sketch_error, a quantile Sketch of every value column per combination of
+# keys.  Memory depends on the number of key combinations, not on the number
+# of rows.
+#-----------------------------------------------------------------------------
+
+class Summary(object):
+   def __init__(self, keys=(), values=(), edges=None, sketch_error=None):
+      self.keys = list(keys)
+      self.values = list(values)
+      self.edges = edges or {}
+      self.sketch_error = sketch_error
+      self.cells = {}      # tuple of key values -> [count, sum of each value column]
+      self.sketches = {}   # tuple of key values -> [Sketch of each value column]
+      self.ranges = {}     # column name -> (min, max)
+      self.kinds = {}      # column name -> 'categorical' or 'quantitative'
+      self.nrow = 0
+
+   #--------------------------------------------------------------------------
+   # columns: dict of column name -> array of parsed values, for one chunk
+   #--------------------------------------------------------------------------
+   def update(self, columns):
+      if not self.kinds:
+         self.init_roles(columns)
+      columns = self.coerce(columns)
+      n = len(next(iter(columns.values()))) if columns else 0
+      if n == 0:
+         return
+
+      for name in self.kinds:
+         v = columns[name]
+         if self.kinds[name] == 'quantitative' and len(v):
+            m, M = v.min(), v.max()
+            if name in self.ranges:
+               m, M = min(m, self.ranges[name][0]), max(M, self.ranges[name][1])
+            self.ranges[name] = (m, M)
+
+      # combine the keys of each row into a single code
+      keys = [ self.bin(name, columns[name]) for name in self.keys ]
+      cell = np.zeros(n, dtype=np.intp)
+      for v in keys:
+         _, codes = np.unique(v, return_inverse=True)
+         _, cell = np.unique(cell * (codes.max()+1) + codes, return_inverse=True)
+
+      _, first, inverse = np.unique(cell, return_index=True, return_inverse=True)
+      counts = np.bincount(inverse)
+      stats = [ counts ]
+      stats += [ np.bincount(inverse, weights=columns[name]) for name in self.values ]
+      stats = np.column_stack(stats).astype(np.float64)
+      labels = list(zip(*[ v[first].tolist() for v in keys ])) or [ () ]
+
+      for key, s in zip(labels, stats):
+         if key in self.cells:
+            self.cells[key] += s
+         else:
+            self.cells[key] = s.copy()
+
+      if self.sketch_error is not None:
+         order = np.argsort(inverse, kind='mergesort')
+         bounds = np.concatenate(([0], np.cumsum(counts)))
+         for j, key in enumerate(labels):
+            rows = order[bounds[j]:bounds[j+1]]
+            if key not in self.sketches:
+               self.sketches[key] = [ Sketch(self.sketch_error) for name in self.values ]
+            for s, name in zip(self.sketches[key], self.values):
+               s.update(columns[name][rows])
+      self.nrow += n
+
+   #--------------------------------------------------------------------------
+   # Categorical value columns cannot be summed, so they are grouped by.
+   #--------------------------------------------------------------------------
+   def init_roles(self, columns):
+      for name in self.keys + self.values + list(self.edges):
+         if name not in columns:
+            raise Exception("Unknown column: %s" % name)
+         self.kinds[name] = 'categorical' if columns[name].dtype.kind in 'SUO' else 'quantitative'
+      for name in self.edges:
+         if self.kinds[name] == 'categorical':
+            raise Exception("Cannot bin categorical column: %s" % name)
+         if name in self.values:
+            self.values.remove(name)
+         if name not in self.keys:
+            self.keys.append(name)
+      for name in list(self.values):
+         if self.kinds[name] == 'categorical':
+            self.values.remove(name)
+            if name not in self.keys:
+               self.keys.append(name)
+
+   #--------------------------------------------------------------------------
+   # The type of a column is decided by the first chunk.  Later chunks of a
+   # categorical column that happen to parse as numbers are kept as strings.
+   #--------------------------------------------------------------------------
+   def coerce(self, columns):
+      columns = dict(columns)
+      for name, kind in self.kinds.items():
+         categorical = columns[name].dtype.kind in 'SUO'
+         if kind == 'quantitative' and categorical:
+            raise Exception("Column %s is not quantitative after row %d; it cannot be streamed." % (name, self.nrow))
+         if kind == 'categorical' and not categorical:
+            columns[name] = columns[name].astype(str)
+      return columns
+
+   def bin(self, name, values):
+      if name not in self.edges:
+         return values
+      e = self.edges[name]
+      return np.clip(np.searchsorted(e, values, side='right') - 1, 0, len(e) - 2)
+
+   #--------------------------------------------------------------------------
+   # Return the summary as a table: column names, one array per column, the
+   # number of rows summarized by each row of the table and, with
+   # sketch_error, one array of sketches per value column.  Binned columns
+   # hold the center of their bins; value columns hold sums.
+   #--------------------------------------------------------------------------
+   def table(self):
+      keys = sorted(self.cells)
+      stats = np.array([ self.cells[k] for k in keys ]).reshape(len(keys), 1+len(self.values))
+      columns = []
+      for i, name in enumerate(self.keys):
+         v = np.array([ k[i] for k in keys ])
+         if name in self.edges:
+            e = self.edges[name]
+            v = 0.5 * (e[v] + e[v+1]) if len(v) else v.astype(np.float64)
+         columns.append(v)
+      sketches = {}
+      for i, name in enumerate(self.values):
+         columns.append(stats[:, i+1])
+         if self.sketch_error is not None:
+            sketches[name] = np.empty(len(keys), dtype=object)
+            for j, k in enumerate(keys):
+               sketches[name][j] = self.sketches[k][i]
+      return self.keys + self.values, columns, stats[:, 0].astype(np.int64), sketches
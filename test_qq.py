@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import qq
+
+#-----------------------------------------------------------------------------
+# Tail reads a growing file: polls that find no complete new line add nothing,
+# and later lines are parsed once they are complete.
+#-----------------------------------------------------------------------------
+
+class TailTest(unittest.TestCase):
+   def setUp(self):
+      self.dir = tempfile.mkdtemp()
+      self.filename = os.path.join(self.dir, 'f.csv')
+      self.write('a,b,c\n1,2,x\n2,3,y\n')
+
+   def tearDown(self):
+      shutil.rmtree(self.dir)
+
+   def write(self, text):
+      with open(self.filename, 'ab') as f:
+         f.write(text)
+
+   def test_growing_file(self):
+      tail = qq.Tail(self.filename)
+      data = tail.read()
+      self.assertEqual(data.nrow, 2)
+      self.assertEqual(tail.update(), 0)
+      self.write('3,4,')
+      self.assertEqual(tail.update(), 0)
+      self.write('z\n')
+      self.assertEqual(tail.update(), 1)
+      self.assertEqual(tail.update(), 0)
+      self.assertEqual(data.nrow, 3)
+      self.assertEqual(list(data['a'].values), [1, 2, 3])
+      self.assertEqual(data['c'][2], 'z')
+
+   def test_header_only(self):
+      os.remove(self.filename)
+      self.write('a,b,c\n')
+      tail = qq.Tail(self.filename)
+      self.assertEqual(tail.read().nrow, 0)
+      self.assertEqual(tail.update(), 0)
+      self.write('1,2,x\n')
+      self.assertEqual(tail.update(), 1)
+
+   def test_where(self):
+      tail = qq.Tail(self.filename, where=['a > 5'])
+      self.assertEqual(tail.read().nrow, 0)
+      self.write('6,7,w\n4,5,v\n')
+      self.assertEqual(tail.update(), 1)
+      self.assertEqual(tail.update(), 0)
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from utils import parse_column
+
+#-----------------------------------------------------------------------------
+# parse_column must type a column as numbers only when every string is one;
+# a single stray cell keeps the column categorical instead of shifting values.
+#-----------------------------------------------------------------------------
+
+class ParseColumnTest(unittest.TestCase):
+   def column(self, n, i, cell):
+      strings = [ str(j) for j in range(n) ]
+      strings[i] = cell
+      return parse_column(strings)
+
+   def test_integers(self):
+      values = parse_column([ ' "%d" ' % j for j in range(20000) ] + ['-3', '+4'])
+      self.assertEqual(values.dtype, np.int64)
+      self.assertEqual(values[12345], 12345)
+      self.assertEqual(values[-2:].tolist(), [-3, 4])
+
+   def test_stray_cell(self):
+      for n in (250, 20000):
+         for cell in ('NA', '', 'abc', '--1', '1.5x'):
+            for i in (0, 123):
+               values = self.column(n, i, cell)
+               self.assertEqual(values.dtype.kind, 'S', (n, cell, i))
+               self.assertEqual(values[i], cell)
+               self.assertEqual(values[-1], str(n - 1))
+
+   def test_empty(self):
+      for strings in ((), []):
+         values = parse_column(strings)
+         self.assertEqual(values.dtype, np.int64)
+         self.assertEqual(len(values), 0)
+
+   def test_floats(self):
+      for cell, value in (('nan', np.nan), ('1.5', 1.5), ('1e3', 1000.0), ('inf', np.inf)):
+         values = self.column(20000, 0, cell)
+         self.assertEqual(values.dtype, np.float64)
+         np.testing.assert_equal(values[0], value)
+         self.assertEqual(values[12345], 12345.0)
+
+if __name__ == '__main__':
+   unittest.main()
@@ -1,4 +1,5 @@
-import json
+import numpy as np
+from palettes import PALETTES
 
 #-----------------------------------------------------------------------------
 # Attempt to convert input to int, then float, then str.
@@ -19,20 +20,70 @@ def clean_string(d):
    return str(d).strip().replace('"', '')
 
 #-----------------------------------------------------------------------------
+# Bulk versions of clean_string, and of clean_string and convert, for a whole
+# column of strings.  The column is cast to int, then float, as a unit; if
+# neither cast succeeds the cleaned strings are returned.
+#
+# numpy 1.16 casts strings that are not integers ('NA', '', '1.5') to int64
+# without raising, giving garbage, so the column is only cast to int64 when
+# every string is an optional sign and at most 18 digits.  The float64 cast
+# parses each string with float() and raises on bad ones.
+#-----------------------------------------------------------------------------
+
+def clean_column(strings):
+   return np.char.replace(np.char.strip(np.asarray(strings, dtype=str)), '"', '')
+
+def is_integer_column(values):
+   digits = np.char.lstrip(values, '+-')
+   return bool(np.all(np.char.isdigit(digits)) and np.all(np.char.str_len(digits) <= 18)
+      and np.all(np.char.str_len(values) - np.char.str_len(digits) <= 1))
+
+def parse_column(strings):
+   values = clean_column(strings)
+   if len(values) == 0 or is_integer_column(values):
+      return values.astype(np.int64)
+   try:
+      return values.astype(np.float64)
+   except (ValueError, OverflowError):
+      return values
+
+#-----------------------------------------------------------------------------
+# Dictionary-encode values: return the sorted distinct values (levels) and the
+# position of each value among the levels (codes).  Codes take the smallest
+# integer type that holds them, and string levels are interned, so that equal
+# levels of all columns are one object, hashed once.
+#-----------------------------------------------------------------------------
+
+def factorize(values):
+   if not isinstance(values, np.ndarray):
+      values = np.array(values, dtype=object)
+   levels, codes = np.unique(values, return_inverse=True)
+   return intern_levels(levels.tolist()), codes.astype(code_dtype(len(levels)))
+
+def code_dtype(nlevels):
+   for dtype in (np.uint8, np.uint16, np.uint32):
+      if nlevels <= np.iinfo(dtype).max + 1:
+         return dtype
+   return np.int64
+
+def intern_levels(levels):
+   return [ intern(v) if type(v) is str else v for v in levels ]
+
+#-----------------------------------------------------------------------------
+# ColorBrewer palettes, precomputed in palettes.py.
+#-----------------------------------------------------------------------------
 
 class Color(object):
    def __init__(self):
-      self.c = None
-      with open('colorbrewer_all_schemes.json') as f:
-         self.c = json.loads(f.read())
+      self.c = PALETTES
 
    def get(self, color_type, theme, n):
       assert(color_type in ('Qualitative', 'Sequential', 'Diverging'))
-      N = str(max(n,3))
+      N = max(n,3)
       if N not in self.c[color_type][theme]:
          raise Exception("too many colors: %s" % n)
-      colors = self.c[color_type][theme][N]['Colors']
-      colors = [ (a[0]/255.0, a[1]/255.0, a[2]/255.0) for a in colors ]
+      hex = self.c[color_type][theme][N]
+      colors = [ (int(hex[i:i+2],16)/255.0, int(hex[i+2:i+4],16)/255.0, int(hex[i+4:i+6],16)/255.0) for i in range(0, len(hex), 6) ]
       if n == 1:
          return colors[1:2]
       if n == 2: